@@ -1,9 +1,21 @@
 import streamlit as st
 import pandas as pd
-import google.generativeai as genai
 import io
+import json
+import os
+import tempfile
 import time
 
+_script_started = time.perf_counter()
+
+from cache import SummaryCache
+from jobstore import JobStore, upload_hash
+from metrics import RunMetrics
+from pipeline import PipelineSettings, SummaryJob, create_model, read_candidates, write_results
+from prompts import PROMPT_MODES, TEMPLATE_COLUMNS, compare_prompt_tokens
+from streaming_io import FORMATS, MIME_TYPES, detect_format
+from worker import ensure_worker, job_metrics, job_output_path, job_status, submit_job
+
 # --- Page Configuration ---
 st.set_page_config(
     page_title="HCTA AI Report Generator v11",
@@ -11,147 +23,6 @@ st.set_page_config(
     layout="wide"
 )
 
-# --- Savant Prompt Template (v11 - Definitive, Untrimmed, and Complete) ---
-# This is the final version, incorporating all rounds of expert feedback, with the full dictionary and all examples explicitly included.
-SAVANT_PROMPT_TEMPLATE = """
-# Gemini, ACT as an expert-level talent assessment analyst and report writer. Your name is "AnalystAI".
-# Your task is to generate a concise, insightful, and professional leadership potential summary based on candidate data, incorporating multiple rounds of expert feedback to achieve the highest level of nuance, narrative cohesion, and behavioral description.
-# You must adhere to all rules, formats, and interpretation logic provided below without deviation.
-
-# --- REFINED RULES & WRITING STYLE (BASED ON FINAL EXPERT FEEDBACK) ---
-# 1.  **Describe Behaviors, NEVER Name Competencies (ABSOLUTE RULE):** In the summary paragraph, you must NEVER use the names of the competencies or factors (e.g., 'People Potential', 'Sociability', 'Drive Potential'). Instead, you MUST translate those scores into their behavioral descriptions from the dictionary.
-#     - **WRONG:** "...his lower people potential and lack of sociability."
-#     - **RIGHT:** "...his limited ease in social interactions and an inconsistent focus on others’ thoughts and emotions."
-# 2.  **Do Not Make Assumptions or Speculate:** You must not predict future outcomes or use speculative phrases. Stick strictly to the behaviors described in the dictionary.
-#     - **WRONG:** "...'her lack of focus on results could lead to prioritizing relationships over outcomes.'"
-#     - **WRONG:** "...this 'raises concerns' about her ability..."
-#     - **RIGHT:** "Her low drive to achieve results may limit her ability to consistently lead teams toward achieving outcomes..."
-# 3.  **Elaborate on Moderate Scores:** When a key competency is 'Moderate', describe the behavior. Instead of saying a candidate has "moderate drive," explain what that means using the dictionary text: "...a tendency to approach goals with some motivation but not always consistent follow-through."
-# 4.  **Create a Balanced, Holistic Profile:** When describing development areas in the main paragraph, you MUST synthesize 2-3 distinct behavioral weaknesses based on the lowest scores. Do not focus on a single weakness, as this is repetitive and not holistic.
-# 5.  **Adopt a Narrative Flow:** Weave the behavioral descriptions together to tell a cohesive story. Conclude the main paragraph with a forward-looking statement about how addressing development areas will unlock potential.
-# 6.  **Analyze Nuance and Contradictions:** Identify and explain complex patterns. If a high-level competency is high but an underlying factor is low, explain the implication of that contrast.
-# 7.  **Prioritize Impactful Bullet Points:** Select strengths and development areas that have the highest strategic impact on a leadership role.
-# 8.  **Core Rules:** Write in the third person, present tense, American English. The paragraph must be under 200 words. Use pronouns matching the `Gender` input. Do not mention AI or assessments.
-
-# --- FORMAT & STRUCTURE (NON-NEGOTIABLE) ---
-# 1.  **One-Paragraph Summary:** Start *exactly* with the text from the "Overall Leadership" interpretation from the dictionary.
-# 2.  **Bullet Points:** After the paragraph, provide two strengths and two development areas under the headings "Strengths:" and "Development Areas:".
-
-# --- LOGIC & INTERPRETATION ENGINE ---
-# 1.  **Score Categorization:** High = 3.5-5.0; Moderate = 2.5-3.49; Low = 1.0-2.49.
-# 2.  **Strength/Development Rule:** Scores >= 4.0 are *only* strengths. Scores <= 2.0 are *only* development areas.
-# 3.  **BS & TI Mapping:** Use this to find reinforcing or contradictory patterns.
-
-# --- BEHAVIORAL DICTIONARY (USE THIS TEXT EXACTLY) ---
-# **Core Competencies:**
-# Overall Leadership:
-#   - High: Demonstrates high potential with a strong capacity for growth and success in a more complex role.
-#   - Moderate: Demonstrates moderate potential with a reasonable capacity for growth and success in a more complex role.
-#   - Low: Demonstrates low potential with limited to low capacity for growth and success in a more complex role.
-# Reasoning & Problem Solving:
-#   - High: Candidate demonstrates a higher-than-average reasoning and problem-solving ability as compared to a group of peers.
-#   - Moderate: Candidate demonstrates an average reasoning and problem-solving ability as compared to a group of peers.
-#   - Low: Candidate demonstrates a below-average reasoning and problem-solving ability as compared to a group of peers.
-# **Business Simulation (BS) Competencies:**
-# Steers Changes:
-#   - High: Strong ability to recognise and drive change and transformation at an organisational level. Displays strong resilience and strength during adversity and is well equipped to enable buy-in and support.
-#   - Moderate: Moderate ability to contribute to organisational change and transformation. Shows resilience during challenging times and can occasionally support others in gaining buy-in.
-#   - Low: Limited ability to support change and transformation at an organisational level. Struggles to remain resilient during adversity and has difficulty enabling buy-in and support.
-# Manages Stakeholders:
-#   - High: Strong ability to develop and nurture relationships with key stakeholders. Actively finds synergies between organisations to ensure positive outcomes. Networks with stakeholders within and outside one’s industry to stay up-to-date about new developments.
-#   - Moderate: Moderate ability to maintain and build relationships with key stakeholders. Occasionally identifies synergies between organisations and engages with stakeholders to stay informed of developments.
-#   - Low: Limited ability to develop and maintain relationships with stakeholders. Rarely identifies synergies between organisations or engages with external stakeholders to stay informed.
-# Drives Results:
-#   - High: Strong ability to articulate performance standards and metrics that support the achievement of organisational goals. Ensures a high-performance culture across teams and demonstrates grit in achievement of challenging goals.
-#   - Moderate: Moderate ability to articulate performance standards and metrics that contribute to achieving organisational goals. Occasionally supports performance across teams and shows persistence when working towards goals.
-#   - Low: Low ability to articulate performance standards and metrics that support organisational goals. Needs development in fostering a high-performance culture and in maintaining persistence when faced with challenging goals.
-# Thinks Strategically:
-#   - High: Strong ability to balance the achievement of short-term results with creating long-term value and competitive advantage. Successfully translates complex organisational goals into meaningful actions across teams.
-#   - Moderate: Moderate ability to balance short-term results with long-term priorities. Occasionally translates organisational goals into meaningful actions across teams.
-#   - Low: Low ability to balance short-term performance with long-term value creation. Struggles to translate organisational goals into meaningful team actions.
-# Solves Challenges:
-#   - High: Strong ability to deal with ambiguous and complex situations, by making tough decisions where necessary. Is comfortable leading in an environment where goals are frequently complex and thrives during periods of uncertainty.
-#   - Moderate: Moderate ability to handle some ambiguous and complex situations by making necessary decisions. Shows some confidence in leading through moderately uncertain environments.
-#   - Low: Low ability to deal with ambiguity and complexity. Hesitant to make tough decisions and limited confidence in leading through uncertain situations.
-# Develops Talent:
-#   - High: Strong ability to leverage and nurture individual strengths to achieve positive outcomes. Actively fosters a culture of learning and advocates for career advancement opportunities within the organisation.
-#   - Moderate: Moderate ability to recognise and utilise individual strengths to support positive outcomes. Supports learning and contributes to career development within the organisation.
-#   - Low: Low ability to identify and leverage individual strengths. Rarely supports learning or advocates for career development within the organisation.
-# **Thriving Index (TI) Potentials:**
-# Drive Potential:
-#   - High: Consistently demonstrates a positive mindset and motivation; regularly takes initiative to exceed expectations with a strong drive to achieve goals, targets, and results. Seeks fulfillment through impact.
-#   - Moderate: Shows a generally positive mindset and some motivation; occasionally takes initiative and shows a drive to achieve goals, but may need support. Interest in making an impact is present but not sustained.
-#   - Low: Demonstrates limited motivation or initiative; may meet expectations but does not show a consistent drive to exceed them. Fulfillment from work or desire to make an impact is not clearly evident.
-# Learning Potential:
-#   - High: Consistently takes time to focus on personal and professional growth - for both self and others. Actively pursues continuous improvement and excellence; shows clear willingness to learn and unlearn.
-#   - Moderate: Shows some effort toward personal and professional growth. Engages in learning activities but may not do so consistently. Some openness to learning and unlearning.
-#   - Low: Rarely focuses on personal or professional growth. Engagement in learning is limited and may resist feedback or change.
-# People Potential:
-#   - High: Consistently shows capability to lead and inspire others. Displays strong empathy, understanding, and a focus on people. Builds relationships with ease and enjoys social interactions.
-#   - Moderate: Displays some ability to relate to and lead others. May show empathy and focus on people inconsistently. Builds relationships but may need support.
-#   - Low: Shows limited capability in leading or inspiring others. Social interaction may be minimal or strained. Struggles to build and maintain relationships.
-# Strategic Potential:
-#   - High: Approaches work with a strong focus on the bigger picture. Operates independently with minimal guidance. Demonstrates a commercial and strategic mindset, regularly anticipating trends and their impact.
-#   - Moderate: Some awareness of the bigger picture but may need occasional guidance. Understands strategy in parts but may not consistently anticipate trends or broader implications.
-#   - Low: Focus tends to be on immediate tasks. Requires frequent guidance. Shows limited awareness of trends or the strategic impact of work.
-# Execution Potential:
-#   - High: Consistently addresses problems and challenges with confidence and resilience. Takes a diligent, practical, and solution-focused approach to solving issues.
-#   - Moderate: Can address problems but may need support or time to build confidence and resilience. Attempts a practical approach but not always solution-focused.
-#   - Low: Struggles to address problems confidently. May rely heavily on others. Practical or solution-oriented approaches are limited.
-# Change Potential:
-#   - High: Thrives in change and complexity. Manages new ways of working with adaptability, flexibility, and decisiveness during uncertainty.
-#   - Moderate: Generally copes with change and can adapt when needed. May need support to remain flexible or decisive in uncertain situations.
-#   - Low: Struggles with change or uncertainty. May resist new ways of working and has difficulty adapting or deciding in changing circumstances.
-
-# --- GOLD STANDARD EXAMPLES (FINAL HUMAN-CORRECTED SET) ---
-
-# **EXAMPLE 1 (Dipsy):**
-# **INPUT:** Name: Dipsy, Gender: M, Overall Leadership: 4, Reasoning & Problem Solving: 3, Drive Potential: 4, Contribution: 3, Purpose: 4, Achievement: 4, Learning Potential: 3, Mastery: 3, Growth: 2, Insightful: 4, People Potential: 4, Collaboration: 3, Empathy: 4, Sociable: 4, Strategic Potential: 3, Awareness: 2, Autonomy: 3, Perspective: 3, Execution Potential: 3, Resourcefulness: 3, Efficacy: 3, Resilience: 4, Change Potential: 4, Agility: 4, Ambiguity: 4, Venturesome: 2, Steers Changes: 3, Manages Stakeholders: 4, Drives Results: 3, Thinks Strategically: 2, Solves Challenges: 3, Develops Talent: 4
-# **CORRECT OUTPUT:**
-# Dipsy demonstrates high potential with a strong capacity for growth and success in a more complex role. He shows a consistent drive to achieve goals and displays resilience in challenging situations, readily adapting to change and navigating ambiguity. His ability to develop and nurture relationships with key stakeholders is a notable strength, further reinforced by his natural empathy and sociability. His strategic awareness appears limited, with only partial understanding of broader trends and their implications. He tends to show some belief in improvement and change, but this is not consistently applied to himself or others. Additionally, he may be hesitant to engage with ideas that involve risk or discomfort, which could limit his adaptability in unfamiliar situations.
-#
-# Strengths:
-# • Cultivates strong relationships with stakeholders, demonstrating empathy and building rapport with ease.
-# • Demonstrates a consistent drive to achieve goals and displays resilience in challenging situations, readily adapting to change and uncertainty.
-#
-# Development Areas:
-# • May benefit from developing greater strategic awareness to connect his actions to the bigger picture and inform decision-making.
-# • Has an opportunity to cultivate a more venturesome approach, demonstrating greater comfort with taking calculated risks and exploring new ideas.
-
-# **EXAMPLE 2 (Po):**
-# **INPUT:** Name: Po, Gender: M, Overall Leadership: 3, Reasoning & Problem Solving: 2, Drive Potential: 3, Contribution: 2, Purpose: 4, Achievement: 2, Learning Potential: 4, Mastery: 3, Growth: 4, Insightful: 4, People Potential: 2, Collaboration: 3, Empathy: 2, Sociable: 1, Strategic Potential: 3, Awareness: 3, Autonomy: 4, Perspective: 3, Execution Potential: 4, Resourcefulness: 3, Efficacy: 4, Resilience: 4, Change Potential: 3, Agility: 2, Ambiguity: 3, Venturesome: 3, Steers Changes: 4, Manages Stakeholders: 2, Drives Results: 3, Thinks Strategically: 4, Solves Challenges: 2, Develops Talent: 4
-# **CORRECT OUTPUT:**
-# Po demonstrates moderate leadership potential with opportunities for growth. He possesses a strong sense of purpose and a clear commitment to continuous learning and development, actively seeking out new knowledge and experiences. He effectively steers organizational change and demonstrates resilience in the face of challenges. However, his lower scores in reasoning and problem-solving, combined with a tendency to approach goals with some motivation but not always consistent follow-through, may hinder his ability to convert vision into action and outcomes. While he excels at driving change and developing talent, his limited ease in social interactions and an inconsistent focus on others’ thoughts and emotions suggest that building strong, people-centered relationships may be more challenging. Developing stronger interpersonal skills and a more practical problem-solving approach will be crucial for unlocking his full leadership potential and maximizing his impact.
-#
-# Strengths:
-# • Demonstrates a strong ability to recognize and drive organizational change and transformation, displaying resilience and enabling buy-in.
-# • Demonstrates strong learning potential, consistently focusing on personal and professional growth and showing a clear commitment to continuous learning and improvement.
-#
-# Development Areas:
-# • May benefit from enhancing problem-solving capabilities by developing a more analytical and structured approach to complex issues.
-# • Can strengthen his leadership presence by enhancing interpersonal skills, particularly focusing on developing greater empathy and improving sociability to foster stronger team dynamics.
-
-# **EXAMPLE 3 (Tinky Winky):**
-# **INPUT:** Name: Tinky Winky, Gender: F, Overall Leadership: 2, Reasoning & Problem Solving: 3, Drive Potential: 1, Contribution: 2, Purpose: 1, Achievement: 1, Learning Potential: 2, Mastery: 3, Growth: 2, Insightful: 2, People Potential: 4, Collaboration: 3, Empathy: 4, Sociable: 4, Strategic Potential: 2, Awareness: 3, Autonomy: 2, Perspective: 2, Execution Potential: 3, Resourcefulness: 3, Efficacy: 3, Resilience: 2, Change Potential: 2, Agility: 1, Ambiguity: 2, Venturesome: 2, Steers Changes: 2, Manages Stakeholders: 3, Drives Results: 2, Thinks Strategically: 3, Solves Challenges: 2, Develops Talent: 3
-# **CORRECT OUTPUT:**
-# Tinky Winky demonstrates low leadership potential, but significant development is needed for her to succeed in a more complex leadership role. She possesses strong interpersonal skills, demonstrating empathy and building rapport easily. This natural ability to connect with others fosters positive stakeholder relationships. However, her low drive to achieve results may limit her ability to consistently lead teams toward achieving outcomes in more complex settings. She demonstrates limited motivation or initiative and may meet expectations but does not show a consistent drive to exceed them. She may need occasional guidance and understands strategy in parts, but may not consistently anticipate trends or broader implications. Tinky Winky struggles with change or uncertainty and may resist new ways of working, having difficulty adapting or deciding in changing circumstances.
-#
-# Strengths:
-# • Builds rapport with ease, demonstrating high empathy and establishing strong interpersonal connections with others.
-# • Demonstrates strong people potential, readily engaging with stakeholders and fostering positive relationships.
-#
-# Development Areas:
-# • Needs to cultivate a stronger results orientation and demonstrate a more consistent drive to achieve goals.
-# • Should focus on enhancing her ability to drive change and navigate ambiguity, demonstrating greater agility and resilience in challenging situations.
-
-# --- END OF INSTRUCTIONS AND EXAMPLES ---
-
-### NEW CANDIDATE DATA TO ANALYZE ###
-{candidate_data_string}
-
-# AnalystAI, generate the report now.
-"""
-
 # --- App Title and Description ---
 st.title("HCTA AI Report Generator v11 (Definitive)")
 st.markdown("""
@@ -164,18 +35,8 @@ This application uses a Gemini model that has been meticulously engineered with
 # --- Helper function to create and download the sample Excel file ---
 @st.cache_data
 def create_sample_template():
-    # Define all expected columns in the correct order
-    columns = [
-        'Name', 'Gender', 'Overall Leadership', 'Reasoning & Problem Solving',
-        'Drive Potential', 'Contribution', 'Purpose', 'Achievement',
-        'Learning Potential', 'Mastery', 'Growth', 'Insightful',
-        'People Potential', 'Collaboration', 'Empathy', 'Sociable',
-        'Strategic Potential', 'Awareness', 'Autonomy', 'Perspective',
-        'Execution Potential', 'Resourcefulness', 'Efficacy', 'Resilience',
-        'Change Potential', 'Agility', 'Ambiguity', 'Venturesome',
-        'Steers Changes', 'Manages Stakeholders', 'Drives Results',
-        'Thinks Strategically', 'Solves Challenges', 'Develops Talent'
-    ]
+    # All expected columns in the correct order
+    columns = TEMPLATE_COLUMNS
     # Create a sample row based on the final feedback example
     sample_data = {
         'Name': ['Tinky Winky'], 'Gender': ['F'], 'Overall Leadership': [2.0], 'Reasoning & Problem Solving': [3.0],
@@ -197,6 +58,66 @@ def create_sample_template():
     processed_data = output.getvalue()
     return processed_data
 
+def export_results(df, summaries, fmt, metrics_summary=None):
+    # Written incrementally to a temp file (constant_memory for Excel) rather than an in-memory workbook.
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, f"results.{fmt}")
+        write_results(df, summaries, path, metrics_summary)
+        with open(path, 'rb') as f:
+            return f.read()
+
+# --- Cached Loaders ---
+# Streamlit re-runs this script on every widget interaction. Arguments starting with an
+# underscore are not hashed, so these are keyed on the upload's content hash instead of its bytes.
+@st.cache_data(max_entries=8, show_spinner="Reading file...")
+def load_candidates(content_hash, file_name, _data):
+    # The parse time is cached with the table so the run metrics report the real cost, not a cache hit.
+    started = time.perf_counter()
+    df = read_candidates(io.BytesIO(_data), file_name)
+    return df, time.perf_counter() - started
+
+@st.cache_data(max_entries=8)
+def prompt_size_comparison(content_hash, _df):
+    return compare_prompt_tokens(_df)
+
+@st.cache_data(max_entries=4, show_spinner="Preparing partial results...")
+def partial_export(content_hash, prompt_version, saved_count, fmt, _df, _summaries):
+    return export_results(_df, _summaries, fmt)
+
+@st.cache_data(max_entries=8)
+def load_saved_rows(job_path, prompt_version, stamp, _job_store):
+    # Keyed on the job file's mtime and size, so the JSONL is only re-read after a new record.
+    return _job_store.completed(prompt_version)
+
+def file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def upload_content_hash(uploaded_file):
+    # Streamlit gives every upload a new file_id, so the bytes are hashed once per upload, not per rerun.
+    cached = st.session_state.get("upload_hash")
+    if cached is None or cached[0] != uploaded_file.file_id:
+        cached = (uploaded_file.file_id, upload_hash(uploaded_file.getvalue()))
+        st.session_state.upload_hash = cached
+    return cached[1]
+
+@st.cache_data(max_entries=16)
+def read_job_output(path, modified):
+    with open(path, "rb") as f:
+        return f.read()
+
+@st.cache_resource
+def get_summary_cache():
+    return SummaryCache()
+
+@st.cache_resource
+def get_model(model_name, json_output, api_key):
+    # google.generativeai is imported on first use here, not when the page loads.
+    return create_model(PipelineSettings(model_name=model_name, batch_size=2 if json_output else 1), api_key)
+
 sample_excel = create_sample_template()
 st.download_button(
     label="📥 Download Sample Template (Excel)",
@@ -207,78 +128,311 @@ st.download_button(
 
 st.divider()
 
+# Cohorts the background worker runs in parallel; they split the sidebar's RPM/TPM between them.
+WORKER_SLOTS = 2
+
+# --- Generation Settings ---
+with st.sidebar:
+    st.header("⚙️ Generation Settings")
+    max_workers = st.slider("Concurrent requests", min_value=1, max_value=16, value=4,
+                            help="Number of Gemini requests kept in flight at once.")
+    requests_per_minute = st.number_input("Requests per minute (RPM)", min_value=1, value=60, step=10,
+                                          help="Match this to your Gemini quota. Halved automatically on 429 errors.")
+    tokens_per_minute = st.number_input("Tokens per minute (TPM)", min_value=1000, value=1_000_000, step=50_000,
+                                        help="Input-token budget per minute, estimated from prompt length.")
+
+    prompt_mode = st.radio("Prompt mode", PROMPT_MODES, index=0, horizontal=True,
+                           help="Slim pre-resolves score bands and sends only the dictionary lines that apply "
+                                "to each candidate, without the gold examples.")
+    batch_size = st.slider("Candidates per request", min_value=1, max_value=20, value=1,
+                           help="Above 1, candidates are packed into one request that shares the full instructions "
+                                "and returns JSON. Prompt mode is ignored in batch mode.")
+
+    st.header("🗄️ Summary Cache")
+    use_cache = st.checkbox("Reuse cached summaries", value=True,
+                            help="Unchecked: every candidate is regenerated and the cache is refreshed with the new text.")
+    summary_cache = get_summary_cache()
+    st.caption(f"{len(summary_cache)} summaries cached.")
+    if st.button("🗑️ Clear cache"):
+        summary_cache.clear()
+        st.toast("Summary cache cleared.")
+
+    st.header("🛠️ Background Worker")
+    output_format = st.selectbox("Results format", FORMATS, index=0,
+                                 help="CSV and Parquet are faster to write and read for large cohorts.")
+    use_worker = st.checkbox("Run in background worker", value=False,
+                             help="Hand the cohort to a local worker process. It keeps running if this page is "
+                                  f"closed, and up to {WORKER_SLOTS} cohorts run in parallel, each at 1/{WORKER_SLOTS} "
+                                  "of the RPM and TPM set above.")
+
+settings = PipelineSettings(
+    stream=True,
+    max_workers=max_workers,
+    requests_per_minute=requests_per_minute,
+    tokens_per_minute=tokens_per_minute,
+    prompt_mode=prompt_mode,
+    batch_size=batch_size,
+    use_cache=use_cache,
+)
+
+# --- Background Jobs ---
+# Polled in a fragment so progress refreshes without re-running the whole script.
+@st.fragment(run_every=2)
+def show_background_jobs():
+    st.subheader("🛠️ Background Jobs")
+    for job_id, label in reversed(st.session_state.worker_jobs):
+        status = job_status(job_id)
+        done, total = status.get("done", 0), status.get("total")
+        if status["state"] == "done":
+            st.success(f"✅ {label}: {done} summaries generated ({status.get('errors', 0)} errors).")
+            output_path = job_output_path(job_id)
+            fmt = detect_format(output_path)
+            st.download_button(
+                label=f"⬇️ Download results for {label} ({fmt})",
+                data=read_job_output(output_path, os.path.getmtime(output_path)),
+                file_name=f"candidate_summaries_results_v11.{fmt}",
+                mime=MIME_TYPES[fmt],
+                key=f"download_{job_id}",
+            )
+            metrics = job_metrics(job_id)
+            if metrics is not None:
+                st.caption(f"{metrics['wall_seconds']:.1f} s wall · {metrics['total_tokens']:,} tokens · "
+                           f"{metrics['retries']} retries")
+                st.download_button(
+                    label=f"⬇️ Run metrics for {label} (JSON)",
+                    data=json.dumps(metrics, indent=2),
+                    file_name="run_metrics_v11.json",
+                    mime="application/json",
+                    key=f"metrics_{job_id}",
+                )
+        elif status["state"] == "failed":
+            st.error(f"❌ {label}: {status.get('error', 'unknown error')}")
+        elif total:
+            st.progress(done / total, text=f"{label}: {done}/{total} rows")
+            if status.get("rpm"):
+                st.caption(f"Running at {status['rpm']:,.0f} RPM: each of the worker's {status['slots']} "
+                           "slots gets an equal share of the sidebar quota.")
+        else:
+            st.progress(0, text=f"{label}: {status['state']}...")
+
+if "worker_jobs" not in st.session_state:
+    st.session_state.worker_jobs = []
+
+PREVIEW_CHARS = 120
+LARGE_COHORT_ROWS = 5_000
+
+def build_results_table(names, summaries, statuses, latencies):
+    table = pd.DataFrame({
+        "Name": names,
+        "Status": statuses,
+        "Latency (s)": latencies,
+        "Summary preview": [
+            (summary or "").replace("\n", " ")[:PREVIEW_CHARS] for summary in summaries
+        ],
+    })
+    table["Latency (s)"] = table["Latency (s)"].astype(float).round(1)
+    return table
+
+# Paging and search re-run only this fragment, and only one page is ever rendered,
+# so the cost of the results view does not grow with the cohort.
+@st.fragment
+def show_results_browser(last_run):
+    table = last_run["table"]
+    summaries = last_run["summaries"]
+    col1, col2, col3 = st.columns([3, 1, 1])
+    query = col1.text_input("🔍 Search by name or summary text", key="results_query")
+    page_size = col2.selectbox("Rows per page", [25, 50, 100], key="results_page_size")
+    if query:
+        matches = (table["Name"].astype(str).str.contains(query, case=False, regex=False)
+                   | pd.Series(summaries, index=table.index).fillna("").str.contains(query, case=False, regex=False))
+        filtered = table[matches]
+    else:
+        filtered = table
+    pages = max(1, -(-len(filtered) // page_size))
+    page = col3.number_input("Page", min_value=1, max_value=pages, value=1, key="results_page")
+    page_rows = filtered.iloc[(page - 1) * page_size:page * page_size]
+    st.dataframe(page_rows, hide_index=True)
+    st.caption(f"{len(filtered)} of {len(table)} candidates · page {page} of {pages}")
+
+    if len(page_rows):
+        position = st.selectbox("📄 Show full summary for", page_rows.index,
+                                format_func=lambda p: f"{table.at[p, 'Name']} (row {p + 1})")
+        st.markdown(summaries[position])
+
+def format_seconds(value):
+    return "–" if value is None else f"{value:.2f} s"
+
+def show_run_metrics(summary):
+    with st.expander("📊 Run metrics"):
+        col1, col2, col3, col4, col5 = st.columns(5)
+        col1.metric("Latency p50", format_seconds(summary["latency_p50_s"]))
+        col2.metric("Latency p95", format_seconds(summary["latency_p95_s"]))
+        col3.metric("Throughput", f"{summary['throughput_rows_per_s'] or 0:.2f} rows/s")
+        col4.metric("Total tokens", f"{summary['total_tokens']:,}")
+        col5.metric("Error rate", f"{summary['error_rate']:.1%}")
+        estimated = summary["tokens_estimated_calls"]
+        st.caption(f"{summary['api_calls']} API calls, {summary['retries']} retries, "
+                   f"{summary['wall_seconds']:.1f} s wall time."
+                   + (f" Tokens estimated for {estimated} calls without usage metadata." if estimated else ""))
+        st.dataframe(pd.DataFrame(list(summary["stages_seconds"].items()), columns=["Stage", "Seconds"]),
+                     hide_index=True)
+        st.download_button(
+            label="⬇️ Download metrics (JSON)",
+            data=json.dumps(summary, indent=2),
+            file_name="run_metrics_v11.json",
+            mime="application/json"
+        )
+
+def show_last_run(last_run):
+    # Results and export bytes live in session state, so clicking download re-runs nothing.
+    st.success("✅ All summaries generated!")
+    show_results_browser(last_run)
+    exports = last_run["exports"]
+    metrics = last_run["metrics"]
+    if output_format not in exports:
+        # The Run_Metrics sheet is a snapshot taken before this export, so it omits its own export time.
+        with metrics.span("export"):
+            exports[output_format] = export_results(last_run["df"], last_run["summaries"], output_format,
+                                                    metrics.summary())
+    st.download_button(
+        label=f"⬇️ Download All Results with Summaries ({output_format})",
+        data=exports[output_format],
+        file_name=f"candidate_summaries_results_v11.{output_format}",
+        mime=MIME_TYPES[output_format]
+    )
+    show_run_metrics(metrics.summary())
+
 # --- File Uploader ---
-uploaded_file = st.file_uploader("📂 Upload Your Completed Excel File", type=["xlsx"])
+uploaded_file = st.file_uploader("📂 Upload Your Completed Excel File", type=list(FORMATS),
+                                 help="CSV and Parquet files with the same columns are also accepted.")
 
 # --- Main Logic ---
 if uploaded_file is not None:
     try:
-        df = pd.read_excel(uploaded_file)
+        content_hash = upload_content_hash(uploaded_file)
+        df, parse_seconds = load_candidates(content_hash, uploaded_file.name, uploaded_file.getvalue())
         st.success("File Uploaded Successfully!")
         st.dataframe(df.head())
+        if len(df) > LARGE_COHORT_ROWS and not use_worker:
+            st.info(f"📦 {len(df):,} candidates: this page keeps the whole cohort and its results in memory. "
+                    "For large files, tick 'Run in background worker', which streams them in chunks.")
+
+        # Completed rows for this exact file survive refreshes, reruns and restarts. Only rows
+        # generated with the current prompt settings are offered for resuming.
+        job_store = JobStore(content_hash)
+        saved_rows = load_saved_rows(job_store.path, settings.prompt_version, file_stamp(job_store.path), job_store)
+        if saved_rows:
+            st.info(f"💾 {len(saved_rows)} of {len(df)} summaries are already saved for this file. "
+                    + ("Generating will resume with the remaining rows." if use_cache else
+                       "They will be regenerated because cached summaries are not being reused."))
+            col1, col2 = st.columns(2)
+            col1.download_button(
+                label=f"⬇️ Download Partial Results ({output_format})",
+                data=partial_export(content_hash, settings.prompt_version, len(saved_rows), output_format,
+                                    df, [saved_rows.get(position, "") for position in range(len(df))]),
+                file_name=f"candidate_summaries_partial_v11.{output_format}",
+                mime=MIME_TYPES[output_format]
+            )
+            if col2.button("♻️ Discard saved progress"):
+                job_store.reset()
+                st.rerun()
+
+        if st.checkbox("📏 Compare prompt sizes (Full vs Slim)"):
+            comparison = prompt_size_comparison(content_hash, df)
+            full_total = int(comparison['Full prompt tokens'].sum())
+            slim_total = int(comparison['Slim prompt tokens'].sum())
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Full prompt tokens (total)", f"{full_total:,}")
+            col2.metric("Slim prompt tokens (total)", f"{slim_total:,}")
+            col3.metric("Reduction", f"{full_total / slim_total:.1f}x")
+            st.caption("Token counts are estimated at ~4 characters per token.")
+            st.dataframe(comparison)
 
         if st.button("✨ Generate Summaries with Final AI", type="primary"):
             # Check for API Key
             try:
                 api_key = st.secrets["GEMINI_API_KEY"]
-                genai.configure(api_key=api_key)
             except (KeyError, FileNotFoundError):
                 st.error("GEMINI_API_KEY not found. Please add it to your Streamlit secrets.")
                 st.stop()
-            
-            model = genai.GenerativeModel('gemini-2.5-pro')
-            
-            results = []
-            total_candidates = len(df)
+
+            if use_worker:
+                # The key is spooled with the job (readable by its owner only), so whichever worker
+                # is running uses this session's key.
+                ensure_worker(slots=WORKER_SLOTS)
+                job_id = submit_job(uploaded_file.getvalue(), settings, label=uploaded_file.name,
+                                    input_format=detect_format(uploaded_file.name), output_format=output_format,
+                                    api_key=api_key)
+                st.session_state.worker_jobs.append((job_id, uploaded_file.name))
+                st.toast(f"Submitted {uploaded_file.name} to the background worker.")
+                st.rerun()
+
+            model = get_model(settings.model_name, settings.batch_size > 1, api_key)
+            metrics = RunMetrics(settings.to_dict())
+            metrics.add_time("upload parse", parse_seconds)
+            job = SummaryJob(df, settings, model, cache=summary_cache, job_store=job_store, metrics=metrics)
+
+            total_candidates = job.total_to_generate
             progress_bar = st.progress(0, text="Initializing...")
 
-            results_container = st.container()
-
-            for index, row in df.iterrows():
-                progress_text = f"Analyzing {row['Name']} ({index + 1}/{total_candidates})..."
-                progress_bar.progress((index + 1) / total_candidates, text=progress_text)
-                
-                # Create the data string for the prompt
-                candidate_data_string = "# INPUT SCORES:\n"
-                for col_name, value in row.items():
-                    candidate_data_string += f"# {col_name}: {value}\n"
-
-                # Format the final prompt
-                final_prompt = SAVANT_PROMPT_TEMPLATE.format(candidate_data_string=candidate_data_string)
-                
-                try:
-                    # API Call
-                    response = model.generate_content(final_prompt)
-                    summary = response.text
-                except Exception as e:
-                    summary = f"Error generating summary for {row['Name']}: {e}"
-                
-                results.append(summary)
-                
-                # Display result immediately
-                with results_container:
-                    st.subheader(f"Generated Summary for {row['Name']}")
-                    st.markdown(summary)
-                    st.divider()
-
-                time.sleep(2) 
+            st.info(f"Resumed {job.saved_count} saved rows. Summary cache: {job.cache_hits} hits, "
+                    f"{job.cache_misses} misses "
+                    f"({'reused' if use_cache else 'bypassed'} for this run); "
+                    f"{total_candidates} unique rows to generate.")
+
+            # Only the requests in flight and the latest finished summary are drawn while
+            # generating; everything else goes to the paginated results table afterwards.
+            streaming_panel = st.empty()
+            latest_panel = st.empty()
+
+            def show_partials(partials):
+                with streaming_panel.container():
+                    for name, text in partials.items():
+                        st.markdown(f"**✍️ {name}**")
+                        st.caption(text)
+
+            statuses = ["Pending"] * len(df)
+            latencies = [None] * len(df)
+            completed = 0
+            for row_result in job.run(on_partial=show_partials):
+                status = "Error" if row_result.error else row_result.source.title()
+                for duplicate in job.duplicates[job.keys[row_result.position]]:
+                    if row_result.source == 'generated' or duplicate == row_result.position:
+                        statuses[duplicate] = status
+                        latencies[duplicate] = row_result.latency
+                if row_result.source != 'generated':
+                    continue
+                completed += 1
+                progress_text = f"Analyzed {row_result.name} ({completed}/{total_candidates})..."
+                progress_bar.progress(completed / total_candidates, text=progress_text)
+                with latest_panel.container():
+                    st.subheader(f"Latest: {row_result.name}")
+                    st.markdown(row_result.summary)
 
+            metrics.finish()
             progress_bar.empty()
-            st.success("✅ All summaries generated!")
-            
-            df['Generated Summary (v11)'] = results
-            
-            # --- Download Results ---
-            output_results = io.BytesIO()
-            with pd.ExcelWriter(output_results, engine='xlsxwriter') as writer:
-                df.to_excel(writer, index=False, sheet_name='Results_v11')
-            
-            st.download_button(
-                label="⬇️ Download All Results with Summaries (Excel)",
-                data=output_results.getvalue(),
-                file_name="candidate_summaries_results_v11.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
+            streaming_panel.empty()
+            latest_panel.empty()
+            st.session_state.last_run = {
+                "upload": content_hash,
+                "df": df,
+                "summaries": job.results,
+                "table": build_results_table(job.names, job.results, statuses, latencies),
+                "metrics": metrics,
+                "exports": {},
+            }
+            st.session_state.pop("results_page", None)
+
+        # --- Results and Download ---
+        last_run = st.session_state.get("last_run")
+        if last_run is not None and last_run["upload"] == content_hash:
+            show_last_run(last_run)
 
     except Exception as e:
         st.error(f"An error occurred while processing the file: {e}")
+
+if st.session_state.worker_jobs:
+    st.divider()
+    show_background_jobs()
+
+st.sidebar.caption(f"⏱️ Script run: {(time.perf_counter() - _script_started) * 1000:.0f} ms")
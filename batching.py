@@ -0,0 +1,145 @@
+import json
+import re
+import time
+from typing import Any, Dict, Iterator, List, Mapping, Sequence
+
+from engine import GenerationEngine, GenerationResult
+from prompts import PROMPT_VERSION, SAVANT_PROMPT_TEMPLATE, build_candidate_data_string
+
+
+BATCH_PROMPT_VERSION = "batch1-" + PROMPT_VERSION
+
+# Passed to genai.GenerativeModel so Gemini returns bare JSON rather than markdown.
+BATCH_GENERATION_CONFIG = {"response_mime_type": "application/json"}
+
+# Everything in the template before the per-candidate section: rules, dictionary and examples.
+SHARED_INSTRUCTIONS = SAVANT_PROMPT_TEMPLATE[:SAVANT_PROMPT_TEMPLATE.index("### NEW CANDIDATE DATA TO ANALYZE ###")]
+
+BATCH_OUTPUT_RULES = """# --- BATCH OUTPUT FORMAT (OVERRIDES THE OUTPUT LAYOUT ABOVE) ---
+# You will receive several candidates, each introduced by "## CANDIDATE <id>". Write one independent report per candidate, following every rule above.
+# Respond with JSON only, in exactly this shape, with one object per candidate and the ids copied exactly:
+# {"candidates": [{"id": "<id>", "summary": "<one-paragraph summary>", "strengths": ["<strength 1>", "<strength 2>"], "development_areas": ["<development area 1>", "<development area 2>"]}]}
+# Do not include headings or bullet characters inside the JSON strings.
+"""
+
+
+# --- Duplicate Collapsing ---
+def collapse_duplicates(keys: Sequence[str]) -> Dict[str, List[int]]:
+    """Maps each distinct row key to the positions that share it, in first-seen order."""
+    groups: Dict[str, List[int]] = {}
+    for position, key in enumerate(keys):
+        groups.setdefault(key, []).append(position)
+    return groups
+
+
+# --- Prompt Building and Parsing ---
+def build_batch_prompt(rows: Mapping[str, Mapping[str, Any]]) -> str:
+    parts = [SHARED_INSTRUCTIONS, BATCH_OUTPUT_RULES, "### NEW CANDIDATE DATA TO ANALYZE ###\n"]
+    for candidate_id, row in rows.items():
+        parts.append(f"## CANDIDATE {candidate_id}\n{build_candidate_data_string(row)}")
+    parts.append("# AnalystAI, generate the JSON reports now.\n")
+    return "\n".join(parts)
+
+
+def format_summary(report: Mapping[str, Any]) -> str:
+    # Same layout the single-candidate prompt produces, so both modes export alike.
+    lines = [report["summary"].strip(), "", "Strengths:"]
+    lines += [f"• {item.strip()}" for item in report["strengths"]]
+    lines += ["", "Development Areas:"]
+    lines += [f"• {item.strip()}" for item in report["development_areas"]]
+    return "\n".join(lines)
+
+
+def _is_valid_report(report: Any) -> bool:
+    if not isinstance(report, dict):
+        return False
+    if not isinstance(report.get("summary"), str) or not report["summary"].strip():
+        return False
+    for field in ("strengths", "development_areas"):
+        items = report.get(field)
+        if not isinstance(items, list) or not items or not all(isinstance(i, str) and i.strip() for i in items):
+            return False
+    return True
+
+
+def parse_batch_response(text: str, expected_ids: Sequence[str]) -> Dict[str, str]:
+    """Returns formatted summaries for every valid, expected candidate in the response.
+
+    Malformed JSON or unknown ids yield an empty or partial mapping; the caller retries the rest.
+    """
+    text = (text or "").strip()
+    fenced = re.match(r"^```(?:json)?\s*(.*?)\s*```$", text, re.DOTALL)
+    if fenced:
+        text = fenced.group(1)
+    try:
+        payload = json.loads(text)
+    except ValueError:
+        return {}
+    reports = payload.get("candidates") if isinstance(payload, dict) else payload
+    if not isinstance(reports, list):
+        return {}
+
+    expected = set(expected_ids)
+    parsed: Dict[str, str] = {}
+    for report in reports:
+        if _is_valid_report(report) and str(report.get("id")) in expected:
+            parsed.setdefault(str(report["id"]), format_summary(report))
+    return parsed
+
+
+# --- Batch Runner ---
+class BatchRunner:
+    """Generates summaries K candidates per request on top of a GenerationEngine.
+
+    Candidates missing from a partial or malformed reply are re-queued: their batch is split
+    in half each round until single-candidate requests, which are retried `max_single_attempts`
+    times before the candidate is reported as an error.
+    """
+
+    def __init__(self, engine: GenerationEngine, batch_size: int = 5, max_single_attempts: int = 2):
+        self.engine = engine
+        self.batch_size = max(1, int(batch_size))
+        self.max_single_attempts = max(1, int(max_single_attempts))
+
+    def run(self, rows: Sequence[Mapping[str, Any]]) -> Iterator[GenerationResult]:
+        """Yields one result per entry of `rows` (by position) as batches complete."""
+        pending = [list(range(start, min(start + self.batch_size, len(rows))))
+                   for start in range(0, len(rows), self.batch_size)]
+        attempts = [0] * len(rows)
+        single_failures = [0] * len(rows)
+
+        while pending:
+            started = time.perf_counter()
+            prompts = [build_batch_prompt({f"C{i + 1}": rows[p] for i, p in enumerate(batch)})
+                       for batch in pending]
+            if self.engine.metrics is not None:
+                self.engine.metrics.add_time("prompt build", time.perf_counter() - started)
+            retry: List[List[int]] = []
+            for result in self.engine.run(prompts):
+                batch = pending[result.index]
+                ids = {f"C{i + 1}": p for i, p in enumerate(batch)}
+                for p in batch:
+                    attempts[p] += result.attempts
+                parsed = {} if result.error is not None else parse_batch_response(result.text, list(ids))
+
+                missing = []
+                for candidate_id, position in ids.items():
+                    if candidate_id in parsed:
+                        yield GenerationResult(position, parsed[candidate_id], None, attempts[position],
+                                               result.latency)
+                    else:
+                        missing.append(position)
+
+                if len(batch) > 1:
+                    # Split whatever is left so one bad candidate cannot sink its neighbours again.
+                    half = (len(missing) + 1) // 2
+                    retry += [part for part in (missing[:half], missing[half:]) if part]
+                elif missing:
+                    position = missing[0]
+                    single_failures[position] += 1
+                    if single_failures[position] < self.max_single_attempts:
+                        retry.append(missing)
+                    else:
+                        error = result.error or ValueError("Model response did not contain a valid report.")
+                        yield GenerationResult(position, None, error, attempts[position], result.latency)
+            pending = retry
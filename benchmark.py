@@ -0,0 +1,231 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import List, Optional, Sequence
+
+import pandas as pd
+
+from fake_model import LATENCY_DISTRIBUTIONS, FakeGenerativeModel
+from metrics import RunMetrics
+from pipeline import PipelineSettings, run_pipeline
+from prompts import IDENTITY_COLUMNS, PROMPT_MODES, TEMPLATE_COLUMNS
+from streaming_io import FORMATS, ResultWriter
+
+
+# --- Offline Benchmark ---
+# Drives the full upload -> prompt -> generate -> export pipeline against the fake model on
+# synthetic cohorts shaped like the sample template, and compares throughput, peak memory
+# and tokens per candidate with a stored baseline. Each cohort runs in a fresh process with
+# its own working directory, so the summary cache and job store start empty and peak RSS
+# belongs to that run alone.
+COHORT_SIZES = (10, 1_000, 10_000)
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "baseline.json")
+DEFAULT_TOLERANCE = 0.25
+
+
+@dataclass
+class FakeBackend:
+    """FakeGenerativeModel settings: a fast lognormal server with occasional 429 bursts and 500s."""
+    latency: float = 0.02
+    jitter: float = 0.5
+    distribution: str = "lognormal"
+    burst_every: int = 500
+    burst_length: int = 5
+    burst_retry_after: float = 0.05
+    failure_rate: float = 0.002
+    seed: int = 0
+
+    def model(self) -> FakeGenerativeModel:
+        return FakeGenerativeModel(**asdict(self))
+
+
+def benchmark_settings(workers: int = 16, prompt_mode: str = "Full", batch_size: int = 1,
+                       stream: bool = True) -> PipelineSettings:
+    # No TPM budget: at Full-prompt sizes a realistic one would make the 10k cohort take an hour.
+    return PipelineSettings(max_workers=workers, requests_per_minute=100_000, tokens_per_minute=None,
+                            prompt_mode=prompt_mode, batch_size=batch_size, stream=stream)
+
+
+# --- Synthetic Cohorts ---
+def synthetic_cohort(rows: int, seed: int = 0) -> pd.DataFrame:
+    """`rows` distinct candidates in the sample template's columns, with 1-5 scores in half steps."""
+    rng = random.Random(seed)
+    score_columns = [col for col in TEMPLATE_COLUMNS if col not in IDENTITY_COLUMNS]
+    data = {
+        'Name': [f"Candidate {i + 1:05d}" for i in range(rows)],
+        'Gender': [rng.choice("FM") for _ in range(rows)],
+    }
+    for col in score_columns:
+        data[col] = [rng.randint(2, 10) / 2 for _ in range(rows)]
+    return pd.DataFrame(data, columns=TEMPLATE_COLUMNS)
+
+
+def write_cohort(df: pd.DataFrame, path: str, chunk_size: int = 1_000) -> None:
+    with ResultWriter(path, sheet_name='Candidates') as writer:
+        for start in range(0, len(df), chunk_size):
+            writer.write(df.iloc[start:start + chunk_size])
+
+
+# --- Running ---
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_cohort(input_path: str, output_path: str, work_dir: str, settings: dict, backend: dict) -> dict:
+    # Runs in a spawned child: relative cache and job-store paths resolve inside work_dir.
+    os.chdir(work_dir)
+    settings = PipelineSettings(**settings)
+    model = FakeBackend(**backend).model()
+    rss_before = _peak_rss_mb()
+    metrics = RunMetrics(settings.to_dict())
+    started = time.perf_counter()
+    progress = run_pipeline(input_path, output_path, settings, model=model, metrics=metrics)
+    wall = time.perf_counter() - started
+    summary = metrics.summary()
+    rows = max(1, progress.done)
+    return {
+        "rows": progress.done,
+        "wall_seconds": round(wall, 3),
+        "throughput_rows_per_s": round(progress.done / wall, 2),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "rss_growth_mb": round(_peak_rss_mb() - rss_before, 1),
+        "prompt_tokens_per_candidate": round(summary["prompt_tokens"] / rows, 1),
+        "output_tokens_per_candidate": round(summary["output_tokens"] / rows, 1),
+        "api_calls": summary["api_calls"],
+        "retries": summary["retries"],
+        "error_rate": summary["error_rate"],
+        "latency_p50_s": summary["latency_p50_s"],
+        "latency_p95_s": summary["latency_p95_s"],
+        "stages_seconds": summary["stages_seconds"],
+        "throttled_calls": model.throttled,
+        "failed_calls": model.failed,
+    }
+
+
+def run_benchmark(
+    sizes: Sequence[int] = COHORT_SIZES,
+    settings: Optional[PipelineSettings] = None,
+    backend: Optional[FakeBackend] = None,
+    input_format: str = "xlsx",
+    output_format: str = "xlsx",
+) -> dict:
+    settings = settings or benchmark_settings()
+    backend = backend or FakeBackend()
+    report = {
+        "settings": settings.to_dict(),
+        "backend": asdict(backend),
+        "formats": {"input": input_format, "output": output_format},
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "results": {},
+    }
+    context = multiprocessing.get_context("spawn")
+    for rows in sizes:
+        with tempfile.TemporaryDirectory(prefix="hcta-bench-") as work_dir:
+            input_path = os.path.join(work_dir, f"cohort.{input_format}")
+            write_cohort(synthetic_cohort(rows, seed=backend.seed), input_path)
+            output_path = os.path.join(work_dir, f"results.{output_format}")
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                result = pool.submit(_run_cohort, input_path, output_path, work_dir,
+                                     settings.to_dict(), asdict(backend)).result()
+        report["results"][str(rows)] = result
+        print(f"{rows:>6} rows: {result['wall_seconds']:7.1f}s wall, {result['throughput_rows_per_s']:8.1f} rows/s, "
+              f"peak {result['peak_rss_mb']:6.1f} MB (+{result['rss_growth_mb']:.1f}), "
+              f"{result['prompt_tokens_per_candidate']:,.0f} prompt tokens/candidate, "
+              f"{result['retries']} retries, {result['error_rate']:.1%} errors", file=sys.stderr)
+    return report
+
+
+# --- Baseline Comparison ---
+def compare_with_baseline(report: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """Returns a line per regression: throughput or peak memory worse than `tolerance`, or more
+    prompt tokens per candidate (deterministic, so any growth over 1% counts)."""
+    for section in ("settings", "backend", "formats"):
+        if report.get(section) != baseline.get(section):
+            raise ValueError(f"Baseline was recorded with different {section}; rerun with --update-baseline.")
+    regressions = []
+    for rows, current in report["results"].items():
+        previous = baseline.get("results", {}).get(rows)
+        if previous is None:
+            continue
+        checks = (
+            ("throughput_rows_per_s", current["throughput_rows_per_s"] < previous["throughput_rows_per_s"] * (1 - tolerance)),
+            ("peak_rss_mb", current["peak_rss_mb"] > previous["peak_rss_mb"] * (1 + tolerance)),
+            ("prompt_tokens_per_candidate",
+             current["prompt_tokens_per_candidate"] > previous["prompt_tokens_per_candidate"] * 1.01),
+        )
+        for metric, regressed in checks:
+            if regressed:
+                regressions.append(f"{rows} rows: {metric} {previous[metric]} -> {current[metric]}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmark against the fake Gemini backend.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(COHORT_SIZES), help="Cohort sizes to run.")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed fractional drop in throughput or growth in peak memory.")
+    parser.add_argument("--output", help="Also write the full report to this JSON file.")
+    parser.add_argument("--input-format", choices=FORMATS, default="xlsx")
+    parser.add_argument("--output-format", choices=FORMATS, default="xlsx")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--prompt-mode", choices=PROMPT_MODES, default="Full")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--no-stream", action="store_true")
+    defaults = FakeBackend()
+    parser.add_argument("--latency", type=float, default=defaults.latency)
+    parser.add_argument("--jitter", type=float, default=defaults.jitter)
+    parser.add_argument("--distribution", choices=LATENCY_DISTRIBUTIONS, default=defaults.distribution)
+    parser.add_argument("--burst-every", type=int, default=defaults.burst_every, help="0 disables 429 bursts.")
+    parser.add_argument("--burst-length", type=int, default=defaults.burst_length)
+    parser.add_argument("--failure-rate", type=float, default=defaults.failure_rate)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    args = parser.parse_args(argv)
+
+    settings = benchmark_settings(args.workers, args.prompt_mode, args.batch_size, stream=not args.no_stream)
+    backend = FakeBackend(latency=args.latency, jitter=args.jitter, distribution=args.distribution,
+                          burst_every=args.burst_every, burst_length=args.burst_length,
+                          failure_rate=args.failure_rate, seed=args.seed)
+    report = run_benchmark(args.sizes, settings, backend, args.input_format, args.output_format)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}.", file=sys.stderr)
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to record one.", file=sys.stderr)
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    try:
+        regressions = compare_with_baseline(report, baseline, args.tolerance)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    if not regressions:
+        print("No regressions against the baseline.", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+
+DEFAULT_CACHE_PATH = os.environ.get("HCTA_CACHE_PATH", os.path.join(".hcta_cache", "summaries.sqlite"))
+
+
+# --- Cache Keys ---
+def _normalize_value(value: Any) -> Any:
+    # Excel gives 4 and 4.0 interchangeably and pads text with stray spaces; collapse those
+    # so an unchanged candidate always maps to the same key.
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value.strip()
+    if hasattr(value, "item"):
+        value = value.item()  # numpy scalar -> Python scalar
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        if isinstance(value, float) and math.isnan(value):
+            return None
+        return round(float(value), 4)
+    return str(value)
+
+
+def normalize_row(row: Mapping[str, Any]) -> list:
+    return [[str(col).strip(), _normalize_value(value)] for col, value in row.items()]
+
+
+def cache_key(model_name: str, prompt_version: str, row: Mapping[str, Any]) -> str:
+    payload = json.dumps([model_name, prompt_version, normalize_row(row)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# --- SQLite Summary Cache ---
+class SummaryCache:
+    """Content-addressed on-disk store of generated summaries.
+
+    Entries older than `max_age_days` are dropped and, beyond `max_entries`, the least
+    recently used entries are evicted. `hits`/`misses` count lookups on this instance.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = 50_000, max_age_days: float = 90):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS summaries (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_summaries_last_used ON summaries (last_used)")
+        self._conn.commit()
+        self.evict()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        keys = list(keys)
+        found: Dict[str, str] = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit.
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, summary FROM summaries WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE summaries SET last_used = ? WHERE key = ?", [(now, k) for k in found]
+                )
+                self._conn.commit()
+        self.hits += sum(1 for k in keys if k in found)
+        self.misses += sum(1 for k in keys if k not in found)
+        return found
+
+    def get(self, key: str) -> Optional[str]:
+        return self.get_many([key]).get(key)
+
+    def put(self, key: str, model_name: str, prompt_version: str, summary: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, model, prompt_version, summary, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model_name, prompt_version, summary, now, now),
+            )
+            self._conn.commit()
+
+    def evict(self) -> int:
+        removed = 0
+        with self._lock:
+            if self.max_age_days:
+                cutoff = time.time() - self.max_age_days * 86400
+                removed += self._conn.execute("DELETE FROM summaries WHERE created_at < ?", (cutoff,)).rowcount
+            if self.max_entries:
+                removed += self._conn.execute(
+                    "DELETE FROM summaries WHERE key IN ("
+                    "SELECT key FROM summaries ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                ).rowcount
+            self._conn.commit()
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM summaries")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
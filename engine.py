@@ -0,0 +1,303 @@
+import random
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+
+# --- Token Estimation ---
+# Gemini tokens average roughly four characters of English text. This is only used
+# to charge the tokens-per-minute bucket before a request is sent, so an estimate is enough.
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+# --- Rate Limiting ---
+class TokenBucket:
+    """Refills `rate_per_minute` units per minute and holds at most `burst_seconds` of quota.
+
+    The bucket starts empty, so a run is paced from its first request instead of sending a
+    whole minute of quota at once and then running into the server's per-minute window.
+    """
+
+    def __init__(self, rate_per_minute: float, burst_seconds: float = 2.0):
+        self.burst_seconds = float(burst_seconds)
+        self.rate = float(rate_per_minute)
+        self.capacity = self._capacity()
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _capacity(self) -> float:
+        return max(1.0, self.rate * self.burst_seconds / 60.0)
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate / 60.0)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        # Takes `amount` units (possibly going into debt) and returns how long the caller
+        # must wait before its reservation is covered. Requests larger than a minute of quota
+        # are capped so a single oversized prompt cannot block forever.
+        with self.lock:
+            amount = min(float(amount), self.rate)
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens * 60.0 / self.rate
+
+    def set_rate(self, rate_per_minute: float) -> None:
+        with self.lock:
+            self._refill(time.monotonic())
+            if self.tokens < 0:
+                # Debt stands for reservations already scheduled in time; rescale it so a rate
+                # cut slows new requests without pushing those further out.
+                self.tokens *= float(rate_per_minute) / self.rate
+            self.rate = float(rate_per_minute)
+            self.capacity = self._capacity()
+            self.tokens = min(self.tokens, self.capacity)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits shared by all worker threads.
+
+    On a 429/quota error the request rate is halved and every worker pauses for the
+    backoff delay; further 429s during that pause, or before any request has succeeded
+    again, only extend it. Each success then recovers the rate step by step (AIMD).
+    """
+
+    def __init__(self, rpm: float, tpm: Optional[float] = None, min_rpm: float = 1.0):
+        self.max_rpm = float(rpm)
+        self.min_rpm = min(float(min_rpm), self.max_rpm)
+        self.current_rpm = float(rpm)
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.paused_until = 0.0
+        self.cut_since_success = False
+        self.lock = threading.Lock()
+
+    def _pause_remaining(self) -> float:
+        with self.lock:
+            return self.paused_until - time.monotonic()
+
+    def acquire(self, tokens: int = 1) -> None:
+        while True:
+            pause = self._pause_remaining()
+            if pause > 0:
+                time.sleep(pause)
+            delay = self.requests.reserve(1)
+            if self.tokens is not None:
+                delay = max(delay, self.tokens.reserve(tokens))
+            if delay > 0:
+                time.sleep(delay)
+            # A throttle that landed while this thread waited out its reservation applies to
+            # it too; the reservation was taken at the old rate, so take a new one afterwards.
+            if self._pause_remaining() <= 0:
+                return
+
+    def on_throttle(self, delay: float) -> None:
+        with self.lock:
+            now = time.monotonic()
+            # Every request in flight when the server's window fills gets a 429 at once; those
+            # belong to one backoff episode, so only the first of them halves the rate. 429s
+            # with no success since the last cut mean the window is still full, not that the
+            # rate is still too high, so they only extend the pause too.
+            if now >= self.paused_until and not self.cut_since_success:
+                self.current_rpm = max(self.min_rpm, self.current_rpm / 2)
+                self.requests.set_rate(self.current_rpm)
+                self.cut_since_success = True
+            self.paused_until = max(self.paused_until, now + delay)
+
+    def on_success(self) -> None:
+        with self.lock:
+            self.cut_since_success = False
+            if self.current_rpm >= self.max_rpm:
+                return
+            self.current_rpm = min(self.max_rpm, self.current_rpm + self.max_rpm / 20)
+            self.requests.set_rate(self.current_rpm)
+
+
+# --- Error Classification ---
+def is_rate_limit_error(exc: BaseException) -> bool:
+    # google.api_core raises ResourceExhausted (HTTP 429) for both RPM and quota limits;
+    # match on name and message so the engine does not need to import google.api_core.
+    name = type(exc).__name__
+    if name in ("ResourceExhausted", "TooManyRequests"):
+        return True
+    message = str(exc).lower()
+    return "429" in message or "quota" in message or "rate limit" in message
+
+
+def suggested_retry_delay(exc: BaseException) -> Optional[float]:
+    # Quota errors usually carry a RetryInfo hint such as "retry_delay { seconds: 17 }"
+    # or "Please retry in 17.4s"; honour it when present.
+    message = str(exc)
+    for pattern in (r"retry_delay\s*\{\s*seconds:\s*(\d+)", r"retry in (\d+(?:\.\d+)?)\s*s"):
+        match = re.search(pattern, message, re.IGNORECASE)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+# --- Generation Engine ---
+@dataclass
+class GenerationResult:
+    index: int
+    text: Optional[str]
+    error: Optional[BaseException] = None
+    attempts: int = 1
+    latency: Optional[float] = None  # seconds from first send to final text, including retries
+    first_chunk_latency: Optional[float] = None  # seconds until streamed text started arriving
+    prompt_tokens: Optional[int] = None  # from the response's usage metadata, when it reports one
+    output_tokens: Optional[int] = None
+
+
+def _chunk_text(chunk: Any) -> str:
+    # A streamed chunk without text parts (e.g. only safety metadata) raises on `.text`.
+    try:
+        return chunk.text or ""
+    except ValueError:
+        return ""
+
+
+def _usage(response: Any) -> tuple:
+    # Gemini responses carry usage_metadata with prompt and candidate token counts; a stream
+    # reports it on its chunks, with the final chunk holding the totals.
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", None)
+    if not prompt_tokens:
+        return None, None
+    return prompt_tokens, getattr(usage, "candidates_token_count", None) or 0
+
+
+class GenerationEngine:
+    """Runs `model.generate_content` for many prompts with bounded concurrency.
+
+    `run()` yields results as they complete; `generate_all()` returns them in input order.
+    With `stream=True` responses are requested as streams and the text received so far for
+    each in-flight prompt is kept in `partials`, keyed by prompt index. If `metrics` is given
+    (see metrics.RunMetrics), every finished request is passed to `metrics.record_call`.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        max_workers: int = 4,
+        rpm: float = 60,
+        tpm: Optional[float] = None,
+        max_retries: int = 6,
+        base_backoff: float = 2.0,
+        max_backoff: float = 60.0,
+        stream: bool = False,
+        metrics: Optional[Any] = None,
+    ):
+        self.model = model
+        self.stream = stream
+        self.metrics = metrics
+        self.partials: Dict[int, str] = {}
+        self._partials_lock = threading.Lock()
+        self.max_workers = max(1, int(max_workers))
+        self.limiter = RateLimiter(rpm, tpm)
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+    def _backoff_delay(self, attempt: int, exc: BaseException) -> float:
+        hinted = suggested_retry_delay(exc)
+        if hinted is not None:
+            return min(self.max_backoff, hinted)
+        delay = min(self.max_backoff, self.base_backoff * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _set_partial(self, index: int, text: Optional[str]) -> None:
+        with self._partials_lock:
+            if text is None:
+                self.partials.pop(index, None)
+            else:
+                self.partials[index] = text
+
+    def _stream_text(self, index: int, prompt: str, started: float) -> tuple:
+        first_chunk = None
+        usage = (None, None)
+        parts = []
+        for chunk in self.model.generate_content(prompt, stream=True):
+            chunk_usage = _usage(chunk)
+            if chunk_usage[0]:
+                usage = chunk_usage
+            piece = _chunk_text(chunk)
+            if not piece:
+                continue
+            if first_chunk is None:
+                first_chunk = time.monotonic() - started
+            parts.append(piece)
+            self._set_partial(index, "".join(parts))
+        return "".join(parts), first_chunk, usage
+
+    def _finish(self, result: GenerationResult, tokens: int) -> GenerationResult:
+        if self.metrics is not None:
+            self.metrics.record_call(result, tokens)
+        return result
+
+    def _generate(self, index: int, prompt: str) -> GenerationResult:
+        tokens = estimate_tokens(prompt)
+        attempt = 0
+        started = None
+        while True:
+            self.limiter.acquire(tokens)
+            if started is None:
+                started = time.monotonic()
+            try:
+                if self.stream:
+                    text, first_chunk, usage = self._stream_text(index, prompt, started)
+                else:
+                    response = self.model.generate_content(prompt)
+                    text, first_chunk, usage = response.text, None, _usage(response)
+            except Exception as e:
+                self._set_partial(index, None)
+                if is_rate_limit_error(e) and attempt < self.max_retries:
+                    self.limiter.on_throttle(self._backoff_delay(attempt, e))
+                    attempt += 1
+                    continue
+                return self._finish(GenerationResult(index, None, e, attempt + 1, time.monotonic() - started),
+                                    tokens)
+            self._set_partial(index, None)
+            self.limiter.on_success()
+            return self._finish(GenerationResult(index, text, None, attempt + 1, time.monotonic() - started,
+                                                 first_chunk, *usage), tokens)
+
+    def run(
+        self,
+        prompts: Sequence[str],
+        on_tick: Optional[Callable[[Dict[int, str]], None]] = None,
+        tick_interval: float = 0.25,
+    ) -> Iterator[GenerationResult]:
+        """Yields results in completion order.
+
+        `on_tick` is called from the consuming thread at least every `tick_interval` seconds
+        with a snapshot of `partials`, so a UI can render streamed text as it arrives.
+        """
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            pending = {executor.submit(self._generate, i, p) for i, p in enumerate(prompts)}
+            while pending:
+                done, pending = wait(pending, timeout=tick_interval if on_tick else None,
+                                     return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+                if on_tick is not None:
+                    with self._partials_lock:
+                        snapshot = dict(self.partials)
+                    on_tick(snapshot)
+        finally:
+            # If the consumer stops early (e.g. Streamlit rerun), drop queued work.
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def generate_all(self, prompts: Sequence[str]) -> List[GenerationResult]:
+        results: List[Optional[GenerationResult]] = [None] * len(prompts)
+        for result in self.run(prompts):
+            results[result.index] = result
+        return results
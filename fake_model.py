@@ -0,0 +1,176 @@
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import deque
+
+
+# --- Offline stand-in for genai.GenerativeModel ---
+# Mimics the parts of the Gemini client the app uses (`generate_content` returning an
+# object with `.text` and `.usage_metadata`, optionally as a stream) so the generation
+# engine can be exercised without network or quota. Latency distribution, 429 bursts and
+# intermittent server errors are configurable for benchmarking.
+
+LATENCY_DISTRIBUTIONS = ("normal", "lognormal", "exponential", "constant")
+
+
+class FakeResourceExhausted(Exception):
+    """Raised like google.api_core.exceptions.ResourceExhausted (HTTP 429)."""
+
+
+class FakeServerError(Exception):
+    """Raised like google.api_core.exceptions.InternalServerError (HTTP 500)."""
+
+
+class FakeUsageMetadata:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class FakeResponse:
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class FakeGenerativeModel:
+    """Fake Gemini model.
+
+    `latency` is the mean (median for "lognormal") response time in seconds; `jitter` is the
+    standard deviation for "normal" and the log-space sigma for "lognormal". Every
+    `burst_every` calls, the last `burst_length` of them are rejected with a 429 carrying a
+    `burst_retry_after` retry hint, and `failure_rate` of the remaining calls fail with a 500
+    (mid-stream when streaming).
+    """
+
+    def __init__(
+        self,
+        model_name="fake-gemini",
+        latency=0.5,
+        jitter=0.2,
+        server_rpm=None,
+        seed=None,
+        distribution="normal",
+        burst_every=0,
+        burst_length=0,
+        burst_retry_after=1.0,
+        failure_rate=0.0,
+    ):
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{distribution}'.")
+        self.model_name = model_name
+        self.latency = latency
+        self.jitter = jitter
+        self.server_rpm = server_rpm
+        self.distribution = distribution
+        self.burst_every = burst_every
+        self.burst_length = burst_length
+        self.burst_retry_after = burst_retry_after
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.calls = 0
+        self.throttled = 0
+        self.failed = 0
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+    def _check_quota(self):
+        with self._lock:
+            self.requests += 1
+            if self.burst_every and self.requests % self.burst_every >= self.burst_every - self.burst_length:
+                self.throttled += 1
+                raise FakeResourceExhausted(f"429 Resource has been exhausted (e.g. check quota). "
+                                            f"Please retry in {self.burst_retry_after}s.")
+            # Sliding one-minute window, like the per-minute quota enforced by the API.
+            if not self.server_rpm:
+                return
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            if len(self._recent) >= self.server_rpm:
+                self.throttled += 1
+                raise FakeResourceExhausted("429 Resource has been exhausted (e.g. check quota).")
+            self._recent.append(now)
+
+    def _delay(self):
+        # Called with the lock held; self.random is shared by all worker threads.
+        if self.distribution == "constant" or self.latency <= 0:
+            return max(0.0, self.latency)
+        if self.distribution == "lognormal":
+            return self.random.lognormvariate(math.log(self.latency), self.jitter)
+        if self.distribution == "exponential":
+            return self.random.expovariate(1 / self.latency)
+        return max(0.0, self.random.gauss(self.latency, self.jitter))
+
+    def _reply(self, prompt):
+        # Batched prompts (see batching.build_batch_prompt) get a JSON report per candidate.
+        candidate_ids = re.findall(r"^## CANDIDATE (\S+)$", prompt, re.MULTILINE)
+        if not candidate_ids:
+            return f"Fake summary ({len(prompt)} prompt characters)."
+        return json.dumps({"candidates": [
+            {"id": candidate_id, "summary": f"Fake summary for candidate {candidate_id}.",
+             "strengths": ["Fake strength."], "development_areas": ["Fake development area."]}
+            for candidate_id in candidate_ids
+        ]})
+
+    def _stream(self, text, delay, usage, fail, chunks=4):
+        # Real streams deliver the first chunk well before the full response; usage totals
+        # arrive with the last chunk.
+        words = text.split(" ")
+        step = max(1, len(words) // chunks)
+        for start in range(0, len(words), step):
+            time.sleep(delay / chunks)
+            if fail and start > 0:
+                raise FakeServerError("500 An internal error has occurred. (stream interrupted)")
+            piece = " ".join(words[start:start + step])
+            last = start + step >= len(words)
+            yield FakeResponse(piece if start == 0 else " " + piece, usage if last else None)
+
+    def generate_content(self, prompt, stream=False):
+        self._check_quota()
+        with self._lock:
+            self.calls += 1
+            delay = self._delay()
+            fail = self.failure_rate > 0 and self.random.random() < self.failure_rate
+            if fail:
+                self.failed += 1
+        text = self._reply(prompt)
+        # Token counts follow the same ~4 characters per token rule the engine estimates with.
+        usage = FakeUsageMetadata(max(1, len(prompt) // 4), max(1, len(text) // 4))
+        if stream:
+            return self._stream(text, delay, usage, fail)
+        time.sleep(delay)
+        if fail:
+            raise FakeServerError("500 An internal error has occurred.")
+        return FakeResponse(text, usage)
+
+
+# --- Offline throughput check ---
+if __name__ == "__main__":
+    from engine import GenerationEngine
+
+    parser = argparse.ArgumentParser(description="Run the generation engine against the fake model.")
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rpm", type=float, default=600)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--distribution", choices=LATENCY_DISTRIBUTIONS, default="normal")
+    parser.add_argument("--server-rpm", type=int, default=None)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    model = FakeGenerativeModel(latency=args.latency, server_rpm=args.server_rpm, seed=0,
+                                distribution=args.distribution, failure_rate=args.failure_rate)
+    engine = GenerationEngine(model, max_workers=args.workers, rpm=args.rpm)
+    started = time.perf_counter()
+    results = engine.generate_all([f"prompt {i}" for i in range(args.rows)])
+    elapsed = time.perf_counter() - started
+    errors = sum(1 for r in results if r.error is not None)
+    print(f"{args.rows} rows in {elapsed:.1f}s ({args.rows / elapsed:.1f} rows/s), "
+          f"{errors} errors, {model.throttled} throttled calls")
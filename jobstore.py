@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+
+DEFAULT_JOB_DIR = os.environ.get("HCTA_JOB_DIR", ".hcta_jobs")
+
+
+def upload_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:24]
+
+
+# --- Append-only Job Store ---
+class JobStore:
+    """Durable per-row progress for one uploaded workbook.
+
+    Every finished row is appended to `<job_dir>/<job_id>.jsonl` and fsynced before the
+    call returns, so a crash or browser refresh loses at most the request in flight.
+    The latest record for a row wins; rows whose latest record is an error are not done.
+    """
+
+    def __init__(self, job_id: str, job_dir: str = DEFAULT_JOB_DIR):
+        self.job_id = job_id
+        self.path = os.path.join(job_dir, f"{job_id}.jsonl")
+        self._lock = threading.Lock()
+        os.makedirs(job_dir, exist_ok=True)
+        self._repair_tail()
+
+    def _repair_tail(self) -> None:
+        # Terminate a torn final line so the next append starts on a fresh line.
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        with open(self.path, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+    def _records(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-write; everything before it is intact.
+                    continue
+
+    def completed(self, prompt_version: Optional[str] = None) -> Dict[int, str]:
+        """Finished rows by row number; with `prompt_version`, only rows generated with that prompt."""
+        done: Dict[int, str] = {}
+        for record in self._records():
+            if prompt_version is not None and record.get("prompt_version") != prompt_version:
+                continue
+            if record.get("error"):
+                done.pop(record["row"], None)
+            else:
+                done[record["row"]] = record["summary"]
+        return done
+
+    def record(self, row: int, summary: str, error: bool = False, prompt_version: Optional[str] = None) -> None:
+        line = json.dumps({
+            "row": int(row),
+            "summary": summary,
+            "error": bool(error),
+            "prompt_version": prompt_version,
+            "ts": time.time(),
+        }, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def reset(self) -> None:
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
@@ -0,0 +1,149 @@
+import json
+import math
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+
+METRICS_SHEET = 'Run_Metrics'
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    # Nearest-rank percentile; None when nothing was measured.
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+# --- Run Metrics ---
+class RunMetrics:
+    """Timing spans, per-call latency and token usage for one generation run.
+
+    Shared by the engine's worker threads, so recording is guarded by a lock. `summary()`
+    rolls everything up into a JSON-serialisable dict; `finish()` freezes the wall clock.
+    """
+
+    def __init__(self, context: Optional[Dict[str, Any]] = None):
+        self.context = dict(context or {})
+        self.started_at = datetime.now(timezone.utc)
+        self.started = time.perf_counter()
+        self.ended: Optional[float] = None
+        self.stages: Dict[str, float] = {}
+        self.rows: Counter = Counter()
+        self.row_errors = 0
+        self.calls = 0
+        self.call_errors = 0
+        self.retries = 0
+        self.latencies: List[float] = []
+        self.first_chunk_latencies: List[float] = []
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.estimated_calls = 0
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - started)
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        with self.lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def record_call(self, result: Any, prompt_estimate: int) -> None:
+        """Records one engine request (all of its retries) from a GenerationResult.
+
+        Token counts come from the response's usage metadata; calls without it fall back to
+        the ~4 characters per token estimate and are counted in `estimated_calls`.
+        """
+        prompt_tokens, output_tokens = result.prompt_tokens, result.output_tokens
+        estimated = prompt_tokens is None
+        if estimated:
+            prompt_tokens = prompt_estimate
+            output_tokens = len(result.text or "") // 4
+        with self.lock:
+            self.calls += 1
+            self.retries += max(0, result.attempts - 1)
+            if result.error is not None:
+                self.call_errors += 1
+            if result.latency is not None:
+                self.latencies.append(result.latency)
+            if result.first_chunk_latency is not None:
+                self.first_chunk_latencies.append(result.first_chunk_latency)
+            self.prompt_tokens += prompt_tokens
+            self.output_tokens += output_tokens or 0
+            self.estimated_calls += estimated
+
+    def count_rows(self, source: str, count: int = 1, error: bool = False) -> None:
+        with self.lock:
+            self.rows[source] += count
+            if error:
+                self.row_errors += count
+
+    def finish(self) -> None:
+        if self.ended is None:
+            self.ended = time.perf_counter()
+
+    @property
+    def wall_seconds(self) -> float:
+        return (self.ended if self.ended is not None else time.perf_counter()) - self.started
+
+    def summary(self) -> Dict[str, Any]:
+        with self.lock:
+            rows = sum(self.rows.values())
+            wall = self.wall_seconds
+            latency_p50 = _percentile(self.latencies, 0.50)
+            latency_p95 = _percentile(self.latencies, 0.95)
+            return {
+                "started_at": self.started_at.isoformat(timespec="seconds"),
+                "wall_seconds": round(wall, 3),
+                "rows": rows,
+                "rows_generated": self.rows["generated"],
+                "rows_cached": self.rows["cached"],
+                "rows_saved": self.rows["saved"],
+                "row_errors": self.row_errors,
+                "error_rate": round(self.row_errors / rows, 4) if rows else 0.0,
+                "throughput_rows_per_s": round(rows / wall, 3) if wall > 0 else None,
+                "api_calls": self.calls,
+                "api_errors": self.call_errors,
+                "retries": self.retries,
+                "latency_p50_s": round(latency_p50, 3) if latency_p50 is not None else None,
+                "latency_p95_s": round(latency_p95, 3) if latency_p95 is not None else None,
+                "latency_max_s": round(max(self.latencies), 3) if self.latencies else None,
+                "first_chunk_p50_s": (round(_percentile(self.first_chunk_latencies, 0.50), 3)
+                                      if self.first_chunk_latencies else None),
+                "prompt_tokens": self.prompt_tokens,
+                "output_tokens": self.output_tokens,
+                "total_tokens": self.prompt_tokens + self.output_tokens,
+                "tokens_estimated_calls": self.estimated_calls,
+                "stages_seconds": {stage: round(seconds, 3) for stage, seconds in self.stages.items()},
+                "settings": self.context,
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.summary(), indent=2)
+
+
+def summary_frame(summary: Dict[str, Any]) -> pd.DataFrame:
+    """Flattens a run summary into Metric/Value rows for the Run_Metrics sheet."""
+    records = []
+    for key, value in summary.items():
+        if isinstance(value, dict):
+            records += [(f"{key}.{name}", inner) for name, inner in value.items()]
+        else:
+            records.append((key, value))
+    # Settings may hold None (e.g. no TPM limit); show those as blank text rather than NaN.
+    return pd.DataFrame(
+        [(key, "" if value is None else value if isinstance(value, (int, float)) else str(value))
+         for key, value in records],
+        columns=["Metric", "Value"],
+    )
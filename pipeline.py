@@ -0,0 +1,347 @@
+import argparse
+import os
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+from batching import BATCH_GENERATION_CONFIG, BATCH_PROMPT_VERSION, BatchRunner, collapse_duplicates
+from cache import SummaryCache, cache_key
+from engine import GenerationEngine
+from jobstore import JobStore
+from metrics import METRICS_SHEET, RunMetrics, summary_frame
+from prompts import IDENTITY_COLUMNS, PROMPT_MODES, build_prompts, prompt_version
+from streaming_io import DEFAULT_CHUNK_SIZE, ResultWriter, count_rows, detect_format, file_hash, iter_chunks, read_table
+
+
+MODEL_NAME = 'gemini-2.5-pro'
+RESULT_COLUMN = 'Generated Summary (v11)'
+RESULT_SHEET = 'Results_v11'
+# Text columns of the results table; every other template column is a float score.
+STRING_COLUMNS = (*IDENTITY_COLUMNS, RESULT_COLUMN)
+
+
+# --- Settings ---
+@dataclass
+class PipelineSettings:
+    model_name: str = MODEL_NAME
+    max_workers: int = 4
+    requests_per_minute: float = 60
+    tokens_per_minute: Optional[float] = 1_000_000
+    prompt_mode: str = "Full"
+    batch_size: int = 1
+    use_cache: bool = True
+    stream: bool = False  # stream responses so partial text can be shown (single-candidate mode only)
+
+    @property
+    def prompt_version(self) -> str:
+        return BATCH_PROMPT_VERSION if self.batch_size > 1 else prompt_version(self.prompt_mode)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+# --- Upload Parsing and Export ---
+def read_candidates(source: Any, name: str = 'upload.xlsx') -> pd.DataFrame:
+    return read_table(source, detect_format(name))
+
+
+def with_summaries(df: pd.DataFrame, summaries: List[Optional[str]]) -> pd.DataFrame:
+    df_results = df.copy()
+    df_results[RESULT_COLUMN] = summaries
+    return df_results
+
+
+def write_results(
+    df: pd.DataFrame,
+    summaries: List[Optional[str]],
+    path: str,
+    metrics_summary: Optional[Dict[str, Any]] = None,
+) -> None:
+    """Writes `df` plus the summary column to `path`; the format follows the file extension.
+
+    Excel output also gets a Run_Metrics sheet when `metrics_summary` is given.
+    """
+    with ResultWriter(path, sheet_name=RESULT_SHEET, string_columns=STRING_COLUMNS) as writer:
+        for start in range(0, len(df), DEFAULT_CHUNK_SIZE):
+            end = start + DEFAULT_CHUNK_SIZE
+            writer.write(with_summaries(df.iloc[start:end], summaries[start:end]))
+        if metrics_summary is not None and writer.fmt == "xlsx":
+            writer.add_sheet(METRICS_SHEET, summary_frame(metrics_summary))
+
+
+def create_model(settings: PipelineSettings, api_key: Optional[str] = None):
+    import google.generativeai as genai
+
+    if api_key:
+        genai.configure(api_key=api_key)
+    if settings.batch_size > 1:
+        return genai.GenerativeModel(settings.model_name, generation_config=BATCH_GENERATION_CONFIG)
+    return genai.GenerativeModel(settings.model_name)
+
+
+# --- Summary Job ---
+def make_engine(model: Any, settings: PipelineSettings, metrics: Optional[RunMetrics] = None) -> GenerationEngine:
+    return GenerationEngine(
+        model,
+        max_workers=settings.max_workers,
+        rpm=settings.requests_per_minute,
+        tpm=settings.tokens_per_minute,
+        stream=settings.stream and settings.batch_size <= 1,
+        metrics=metrics,
+    )
+
+
+
+@dataclass
+class RowResult:
+    position: int
+    name: str
+    summary: str
+    error: bool
+    source: str  # 'saved', 'cached' or 'generated'
+    latency: Optional[float] = None
+
+
+class SummaryJob:
+    """Plans and runs generation for one cohort.
+
+    Rows already in the job store for the same prompt version are resumed, rows in the summary
+    cache are answered locally, and exact duplicate rows are generated once; with `use_cache`
+    off, every row is generated. `run()` yields a RowResult for every row, prefilled rows
+    first, then generated rows in completion order. Timings, API calls and token usage are
+    recorded in `metrics`. Pass `engine` (see make_engine) to share one rate
+    limiter between several jobs, e.g. the chunks of one file.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        settings: PipelineSettings,
+        model: Any,
+        cache: Optional[SummaryCache] = None,
+        job_store: Optional[JobStore] = None,
+        row_offset: int = 0,
+        metrics: Optional[RunMetrics] = None,
+        engine: Optional[GenerationEngine] = None,
+    ):
+        self.df = df
+        self.engine = engine
+        self.metrics = metrics if metrics is not None else RunMetrics(settings.to_dict())
+        self.row_offset = row_offset
+        self.settings = settings
+        self.model = model
+        self.cache = cache
+        self.job_store = job_store
+        self.names = df['Name'].tolist() if 'Name' in df.columns else [str(i + 1) for i in range(len(df))]
+        self.results: List[Optional[str]] = [None] * len(df)
+        self.error_count = 0
+
+        self.version = settings.prompt_version
+        with self.metrics.span("plan"):
+            self.keys = [cache_key(settings.model_name, self.version, row) for row in df.to_dict('records')]
+            self.duplicates = collapse_duplicates(self.keys)
+            # Job store rows are numbered across the whole file; `position` is local to this frame.
+            # Saved rows count only for the same prompt, and not at all when the cache is bypassed.
+            saved = job_store.completed(self.version) if job_store is not None and settings.use_cache else {}
+            saved = {row - row_offset: summary for row, summary in saved.items()
+                     if row_offset <= row < row_offset + len(df)}
+            cached = cache.get_many(self.keys) if cache is not None and settings.use_cache else {}
+
+            self.prefilled: List[RowResult] = []
+            for position, key in enumerate(self.keys):
+                if position in saved:
+                    self._prefill(position, saved[position], 'saved')
+                elif key in cached:
+                    self._prefill(position, cached[key], 'cached')
+                    if job_store is not None:
+                        job_store.record(row_offset + position, cached[key], prompt_version=self.version)
+        self.saved_count = sum(1 for r in self.prefilled if r.source == 'saved')
+        self.cache_hits = sum(1 for r in self.prefilled if r.source == 'cached')
+        self.cache_misses = len(df) - len(self.prefilled)
+        self.prompt_rows = [positions[0] for positions in self.duplicates.values()
+                            if any(self.results[position] is None for position in positions)]
+
+    def _prefill(self, position: int, summary: str, source: str) -> None:
+        self.results[position] = summary
+        self.prefilled.append(RowResult(position, self.names[position], summary, False, source))
+
+    @property
+    def total_to_generate(self) -> int:
+        return len(self.prompt_rows)
+
+    def _generation(self, on_partial: Optional[Callable[[Dict[str, str]], None]]):
+        batched = self.settings.batch_size > 1
+        engine = self.engine or make_engine(self.model, self.settings, self.metrics)
+        rows = self.df.iloc[self.prompt_rows]
+        if batched:
+            return BatchRunner(engine, batch_size=self.settings.batch_size).run(rows.to_dict('records'))
+
+        on_tick = None
+        if on_partial is not None:
+            def on_tick(partials: Dict[int, str]) -> None:
+                on_partial({self.names[self.prompt_rows[index]]: text for index, text in partials.items()})
+        with self.metrics.span("prompt build"):
+            prompts = build_prompts(rows, self.settings.prompt_mode)
+        return engine.run(prompts, on_tick=on_tick)
+
+    def run(self, on_partial: Optional[Callable[[Dict[str, str]], None]] = None) -> Iterator[RowResult]:
+        """Yields a RowResult per row; `on_partial` receives {name: text so far} while streaming."""
+        for row_result in self.prefilled:
+            self.metrics.count_rows(row_result.source)
+            yield row_result
+        if not self.prompt_rows:
+            return
+        generation = self._generation(on_partial)
+        started = time.perf_counter()
+        try:
+            # Results arrive in completion order; they are slotted back by row position.
+            for result in generation:
+                position = self.prompt_rows[result.index]
+                name = self.names[position]
+                duplicates = self.duplicates[self.keys[position]]
+                if result.error is None:
+                    summary = result.text
+                    if self.cache is not None:
+                        self.cache.put(self.keys[position], self.settings.model_name, self.version, summary)
+                else:
+                    summary = f"Error generating summary for {name}: {result.error}"
+                    self.error_count += len(duplicates)
+                for duplicate in duplicates:
+                    self.results[duplicate] = summary
+                    if self.job_store is not None:
+                        self.job_store.record(self.row_offset + duplicate, summary, error=result.error is not None,
+                                              prompt_version=self.version)
+                self.metrics.count_rows('generated', len(duplicates), error=result.error is not None)
+                yield RowResult(position, name, summary, result.error is not None, 'generated', result.latency)
+        finally:
+            self.metrics.add_time("generate", time.perf_counter() - started)
+        if self.cache is not None:
+            self.cache.evict()
+
+
+# --- Headless Pipeline ---
+@dataclass
+class PipelineProgress:
+    total: Optional[int] = None
+    done: int = 0
+    errors: int = 0
+
+
+def run_pipeline(
+    input_path: str,
+    output_path: str,
+    settings: PipelineSettings,
+    model: Any = None,
+    api_key: Optional[str] = None,
+    resume: bool = True,
+    on_result: Optional[Callable[[RowResult, PipelineProgress], None]] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    metrics: Optional[RunMetrics] = None,
+) -> PipelineProgress:
+    """Upload parsing, prompt construction, generation and export for one input file.
+
+    Input is read and generated `chunk_size` rows at a time and each finished chunk is
+    appended to the output, so memory stays flat however many candidates the file holds.
+    Stage timings and token usage go to `metrics`; Excel output also gets a Run_Metrics sheet.
+    """
+    if metrics is None:
+        metrics = RunMetrics(settings.to_dict())
+    input_format = detect_format(input_path)
+    if model is None:
+        model = create_model(settings, api_key)
+    job_store = JobStore(file_hash(input_path))
+    if not resume:
+        job_store.reset()
+    cache = SummaryCache()
+    # One engine for the whole file, so the RPM/TPM budget and any 429 backoff carry across chunks.
+    engine = make_engine(model, settings, metrics)
+    with metrics.span("upload parse"):
+        progress = PipelineProgress(total=count_rows(input_path, input_format))
+        chunks = iter_chunks(input_path, input_format, chunk_size)
+
+    with ResultWriter(output_path, sheet_name=RESULT_SHEET, string_columns=STRING_COLUMNS) as writer:
+        while True:
+            with metrics.span("upload parse"):
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            job = SummaryJob(chunk, settings, model, cache=cache, job_store=job_store,
+                             row_offset=int(chunk.index[0]), metrics=metrics, engine=engine)
+            errors_before = progress.errors
+            for row_result in job.run():
+                # A generated row also fills its exact duplicates within the chunk.
+                if row_result.source == 'generated':
+                    progress.done += len(job.duplicates[job.keys[row_result.position]])
+                else:
+                    progress.done += 1
+                progress.errors = errors_before + job.error_count
+                if on_result is not None:
+                    on_result(row_result, progress)
+            with metrics.span("export"):
+                writer.write(with_summaries(chunk, job.results))
+        metrics.finish()
+        if writer.fmt == "xlsx":
+            writer.add_sheet(METRICS_SHEET, summary_frame(metrics.summary()))
+    return progress
+
+
+# --- Command-line Entry Point ---
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate HCTA leadership summaries for a candidate workbook.")
+    parser.add_argument("input", help="Candidate file (.xlsx, .csv or .parquet) in the sample template layout.")
+    parser.add_argument("output", help="Where to write the results (.xlsx, .csv or .parquet).")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent requests.")
+    parser.add_argument("--rpm", type=float, default=60, help="Requests per minute.")
+    parser.add_argument("--tpm", type=float, default=1_000_000, help="Tokens per minute.")
+    parser.add_argument("--prompt-mode", choices=PROMPT_MODES, default="Full")
+    parser.add_argument("--batch-size", type=int, default=1, help="Candidates per request.")
+    parser.add_argument("--no-cache", action="store_true", help="Regenerate every row and refresh the cache.")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore saved progress for this workbook.")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows read and generated at a time.")
+    parser.add_argument("--fake", action="store_true", help="Use the offline fake model instead of Gemini.")
+    parser.add_argument("--metrics-json", help="Also write the run's performance summary to this JSON file.")
+    args = parser.parse_args(argv)
+
+    settings = PipelineSettings(
+        model_name=args.model,
+        max_workers=args.workers,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        prompt_mode=args.prompt_mode,
+        batch_size=args.batch_size,
+        use_cache=not args.no_cache,
+    )
+    model = None
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if args.fake:
+        from fake_model import FakeGenerativeModel
+        model = FakeGenerativeModel(model_name=args.model)
+    elif not api_key:
+        print("GEMINI_API_KEY is not set.", file=sys.stderr)
+        return 2
+
+    def report(row_result: RowResult, progress: PipelineProgress) -> None:
+        status = "error" if row_result.error else row_result.source
+        print(f"[{status}] {row_result.name} ({progress.done}/{progress.total or '?'})", file=sys.stderr)
+
+    metrics = RunMetrics(settings.to_dict())
+    progress = run_pipeline(args.input, args.output, settings, model=model, api_key=api_key,
+                            resume=not args.no_resume, on_result=report, chunk_size=args.chunk_size,
+                            metrics=metrics)
+    summary = metrics.summary()
+    print(f"Wrote {progress.done} rows to {args.output} ({progress.errors} errors).", file=sys.stderr)
+    print(f"{summary['wall_seconds']:.1f}s wall, {summary['throughput_rows_per_s'] or 0:.2f} rows/s, "
+          f"latency p50 {summary['latency_p50_s'] or 0:.2f}s / p95 {summary['latency_p95_s'] or 0:.2f}s, "
+          f"{summary['total_tokens']:,} tokens, {summary['retries']} retries.", file=sys.stderr)
+    if args.metrics_json:
+        with open(args.metrics_json, "w", encoding="utf-8") as f:
+            f.write(metrics.to_json())
+    return 1 if progress.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
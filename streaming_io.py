@@ -0,0 +1,250 @@
+import csv
+import hashlib
+import os
+from typing import Any, BinaryIO, Iterable, Iterator, List, Optional, Union
+
+import pandas as pd
+
+
+# --- Formats ---
+FORMATS = ("xlsx", "csv", "parquet")
+MIME_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+DEFAULT_CHUNK_SIZE = 500
+
+Source = Union[str, BinaryIO]
+
+
+def detect_format(name: str) -> str:
+    extension = os.path.splitext(name)[1].lower().lstrip(".")
+    if extension in ("xlsx", "xlsm"):
+        return "xlsx"
+    if extension in ("csv", "parquet"):
+        return extension
+    raise ValueError(f"Unsupported file type '{extension}'. Use one of: {', '.join(FORMATS)}.")
+
+
+def file_hash(source: Source, block_size: int = 1 << 20) -> str:
+    """SHA-256 of a file or seekable buffer read in blocks, matching jobstore.upload_hash."""
+    digest = hashlib.sha256()
+    handle = open(source, "rb") if isinstance(source, str) else source
+    try:
+        handle.seek(0)
+        for block in iter(lambda: handle.read(block_size), b""):
+            digest.update(block)
+    finally:
+        if isinstance(source, str):
+            handle.close()
+        else:
+            handle.seek(0)
+    return digest.hexdigest()[:24]
+
+
+# --- Chunked Readers ---
+def _iter_xlsx(source: Source, chunk_size: int) -> Iterator[pd.DataFrame]:
+    from openpyxl import load_workbook
+
+    # read_only streams rows from the sheet XML instead of building the whole workbook.
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(col) if col is not None else f"Unnamed: {i}" for i, col in enumerate(header)]
+        chunk: List[tuple] = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame.from_records(chunk, columns=columns)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame.from_records(chunk, columns=columns)
+    finally:
+        workbook.close()
+
+
+def _iter_parquet(source: Source, chunk_size: int) -> Iterator[pd.DataFrame]:
+    import pyarrow.parquet as pq
+
+    for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size):
+        yield batch.to_pandas()
+
+
+def _ints_to_float(chunk: pd.DataFrame) -> pd.DataFrame:
+    # A chunk of whole-number scores reads as int64 and one with a 3.5 as float64; reading
+    # every numeric column as float keeps the dtypes (and the Parquet schema) equal across chunks.
+    int_columns = chunk.select_dtypes(include="integer").columns
+    if len(int_columns):
+        chunk[int_columns] = chunk[int_columns].astype("float64")
+    return chunk
+
+
+def iter_chunks(source: Source, fmt: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Yields the candidate table in DataFrames of at most `chunk_size` rows with a running index.
+
+    Integer columns are returned as float64 so every chunk has the same dtypes.
+    """
+    if fmt == "xlsx":
+        chunks = _iter_xlsx(source, chunk_size)
+    elif fmt == "csv":
+        chunks = pd.read_csv(source, chunksize=chunk_size)
+    elif fmt == "parquet":
+        chunks = _iter_parquet(source, chunk_size)
+    else:
+        raise ValueError(f"Unsupported format '{fmt}'.")
+    start = 0
+    for chunk in chunks:
+        chunk.index = pd.RangeIndex(start, start + len(chunk))
+        start += len(chunk)
+        yield _ints_to_float(chunk)
+
+
+def count_rows(source: Source, fmt: str) -> Optional[int]:
+    """Cheap data-row count for progress reporting, without loading the table (None if unknown)."""
+    if fmt == "xlsx":
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(source, read_only=True)
+        try:
+            max_row = workbook.worksheets[0].max_row
+        finally:
+            workbook.close()
+        return max(0, max_row - 1) if max_row else None
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(source).metadata.num_rows
+    if fmt == "csv" and isinstance(source, str):
+        with open(source, newline="", encoding="utf-8") as f:
+            return max(0, sum(1 for _ in csv.reader(f)) - 1)
+    return None
+
+
+def read_table(source: Source, fmt: str) -> pd.DataFrame:
+    """The whole candidate table, built from the same streamed chunks as iter_chunks.
+
+    Only the parsed rows are held, never the full openpyxl workbook that pd.read_excel builds.
+    """
+    chunks = list(iter_chunks(source, fmt))
+    if not chunks:
+        return pd.DataFrame()
+    return pd.concat(chunks) if len(chunks) > 1 else chunks[0]
+
+
+# --- Incremental Writers ---
+class ResultWriter:
+    """Appends result chunks to `path` in xlsx, csv or parquet without holding earlier chunks.
+
+    Excel output uses XlsxWriter's constant_memory mode, which flushes each row to disk as it
+    is written, so rows must arrive in order (chunks are written whole, in input order).
+    The Parquet schema is fixed by the first chunk: `string_columns` are always strings and
+    any other column that is empty throughout that chunk is float64, so a blank first chunk
+    cannot fix a column to the wrong type for the rest of the file.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fmt: Optional[str] = None,
+        sheet_name: str = "Results_v11",
+        string_columns: Iterable[str] = (),
+    ):
+        self.path = path
+        self.fmt = fmt or detect_format(path)
+        self.sheet_name = sheet_name
+        self.string_columns = set(string_columns)
+        self.rows_written = 0
+        self._columns: Optional[List[str]] = None
+        self._workbook = self._worksheet = None
+        self._csv_file = self._csv_writer = None
+        self._parquet_writer = None
+
+    def __enter__(self) -> "ResultWriter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _open(self, columns: List[str]) -> None:
+        self._columns = columns
+        if self.fmt == "xlsx":
+            import xlsxwriter
+
+            self._workbook = xlsxwriter.Workbook(self.path, {"constant_memory": True, "nan_inf_to_errors": True})
+            self._worksheet = self._workbook.add_worksheet(self.sheet_name)
+            bold = self._workbook.add_format({"bold": True})
+            for col, name in enumerate(columns):
+                self._worksheet.write_string(0, col, name, bold)
+        elif self.fmt == "csv":
+            self._csv_file = open(self.path, "w", newline="", encoding="utf-8")
+            self._csv_writer = csv.writer(self._csv_file)
+            self._csv_writer.writerow(columns)
+        elif self.fmt != "parquet":
+            raise ValueError(f"Unsupported format '{self.fmt}'.")
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        if self._columns is None:
+            self._open([str(col) for col in chunk.columns])
+        if self.fmt == "xlsx":
+            for values in chunk.itertuples(index=False, name=None):
+                self.rows_written += 1
+                for col, value in enumerate(values):
+                    if value is None or (isinstance(value, float) and pd.isna(value)):
+                        continue
+                    self._worksheet.write(self.rows_written, col, value.item() if hasattr(value, "item") else value)
+            return
+        if self.fmt == "csv":
+            self._csv_writer.writerows(chunk.itertuples(index=False, name=None))
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, self._parquet_schema(table.schema))
+            self._parquet_writer.write_table(table.cast(self._parquet_writer.schema))
+        self.rows_written += len(chunk)
+
+    def _parquet_schema(self, inferred: Any) -> Any:
+        import pyarrow as pa
+
+        fields = []
+        for field in inferred:
+            if field.name in self.string_columns:
+                field = field.with_type(pa.string())
+            elif pa.types.is_null(field.type):
+                field = field.with_type(pa.float64())
+            fields.append(field)
+        # The pandas metadata describes the first chunk's dtypes, so it is left out.
+        return pa.schema(fields)
+
+    def add_sheet(self, name: str, frame: pd.DataFrame) -> None:
+        """Adds a small extra worksheet (e.g. run metrics) after the results; Excel output only."""
+        if self.fmt != "xlsx":
+            raise ValueError(f"Extra sheets need xlsx output, not '{self.fmt}'.")
+        if self._columns is None:
+            self._open([])
+        worksheet = self._workbook.add_worksheet(name)
+        bold = self._workbook.add_format({"bold": True})
+        for col, column in enumerate(frame.columns):
+            worksheet.write_string(0, col, str(column), bold)
+        for row, values in enumerate(frame.itertuples(index=False, name=None), start=1):
+            for col, value in enumerate(values):
+                worksheet.write(row, col, value.item() if hasattr(value, "item") else value)
+
+    def close(self) -> None:
+        if self._workbook is not None:
+            self._workbook.close()
+            self._workbook = None
+        if self._csv_file is not None:
+            self._csv_file.close()
+            self._csv_file = None
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
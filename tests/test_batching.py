@@ -0,0 +1,81 @@
+import json
+import re
+
+from batching import BatchRunner, build_batch_prompt, collapse_duplicates, parse_batch_response
+from engine import GenerationEngine
+from fake_model import FakeGenerativeModel
+
+
+def _report(candidate_id, summary="Summary."):
+    return {"id": candidate_id, "summary": summary, "strengths": ["Strength."],
+            "development_areas": ["Development area."]}
+
+
+class DroppingModel(FakeGenerativeModel):
+    """Leaves out the report for any candidate whose Name is listed in `dropped`."""
+
+    def __init__(self, dropped=(), **kwargs):
+        super().__init__(latency=0, seed=0, **kwargs)
+        self.dropped = set(dropped)
+        self.batch_sizes = []
+
+    def _reply(self, prompt):
+        sections = re.findall(r"^## CANDIDATE (\S+)\n# INPUT SCORES:\n# Name: (.*)$", prompt, re.MULTILINE)
+        self.batch_sizes.append(len(sections))
+        return json.dumps({"candidates": [_report(candidate_id, f"Summary for {name}.")
+                                          for candidate_id, name in sections if name not in self.dropped]})
+
+
+def _rows(count):
+    return [{"Name": f"Candidate {i}", "Drive Potential": 3.0} for i in range(count)]
+
+
+def test_parse_batch_response_formats_valid_reports():
+    text = json.dumps({"candidates": [_report("C1"), _report("C2")]})
+    parsed = parse_batch_response(text, ["C1", "C2"])
+    assert set(parsed) == {"C1", "C2"}
+    assert parsed["C1"] == "Summary.\n\nStrengths:\n• Strength.\n\nDevelopment Areas:\n• Development area."
+
+
+def test_parse_batch_response_accepts_fenced_json_and_bare_lists():
+    fenced = "```json\n" + json.dumps({"candidates": [_report("C1")]}) + "\n```"
+    assert set(parse_batch_response(fenced, ["C1"])) == {"C1"}
+    assert set(parse_batch_response(json.dumps([_report("C1")]), ["C1"])) == {"C1"}
+
+
+def test_parse_batch_response_drops_invalid_unknown_and_malformed():
+    invalid = dict(_report("C2"), strengths=[])
+    text = json.dumps({"candidates": [_report("C1"), invalid, _report("C9")]})
+    assert set(parse_batch_response(text, ["C1", "C2"])) == {"C1"}
+    assert parse_batch_response('{"candidates": [', ["C1"]) == {}
+    assert parse_batch_response("", ["C1"]) == {}
+
+
+def test_collapse_duplicates_keeps_first_seen_order():
+    assert collapse_duplicates(["a", "b", "a"]) == {"a": [0, 2], "b": [1]}
+
+
+def test_batch_runner_generates_every_row_in_batches():
+    model = DroppingModel()
+    runner = BatchRunner(GenerationEngine(model, rpm=60_000), batch_size=4)
+    results = sorted(runner.run(_rows(10)), key=lambda r: r.index)
+    assert [r.index for r in results] == list(range(10))
+    assert results[7].text.startswith("Summary for Candidate 7.")
+    assert model.batch_sizes == [4, 4, 2]
+
+
+def test_batch_runner_splits_missing_candidates_and_reports_persistent_failures():
+    model = DroppingModel(dropped={"Candidate 1"})
+    runner = BatchRunner(GenerationEngine(model, rpm=60_000), batch_size=4, max_single_attempts=2)
+    results = {r.index: r for r in runner.run(_rows(4))}
+    assert sorted(results) == [0, 1, 2, 3]
+    assert all(results[i].error is None for i in (0, 2, 3))
+    assert isinstance(results[1].error, ValueError)
+    # The full batch, then the lone missing candidate on its own until it runs out of attempts.
+    assert model.batch_sizes == [4, 1, 1]
+    assert results[1].attempts == 3
+
+
+def test_batch_prompt_lists_each_candidate():
+    prompt = build_batch_prompt({"C1": {"Name": "A"}, "C2": {"Name": "B"}})
+    assert re.findall(r"^## CANDIDATE (\S+)$", prompt, re.MULTILINE) == ["C1", "C2"]
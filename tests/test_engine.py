@@ -0,0 +1,132 @@
+import threading
+import time
+
+from engine import GenerationEngine, RateLimiter, TokenBucket, is_rate_limit_error, suggested_retry_delay
+from fake_model import FakeGenerativeModel, FakeResourceExhausted, FakeServerError
+
+
+def _model(**kwargs):
+    return FakeGenerativeModel(latency=0, seed=0, **kwargs)
+
+
+def test_bucket_starts_empty_and_paces_the_first_requests():
+    bucket = TokenBucket(60)
+    assert 0.9 < bucket.reserve(1) <= 1.0
+    assert 1.9 < bucket.reserve(1) <= 2.0
+
+
+def test_bucket_burst_is_limited_to_a_few_seconds_of_quota():
+    bucket = TokenBucket(6000, burst_seconds=2.0)
+    bucket.updated -= 60  # a minute idle
+    waits = [bucket.reserve(1) for _ in range(300)]
+    assert waits[199] == 0.0
+    assert waits[200] > 0.0
+
+
+def test_throttle_during_a_reservation_wait_holds_the_waiting_thread():
+    limiter = RateLimiter(rpm=600)  # one request per 0.1 s
+    timer = threading.Timer(0.05, limiter.on_throttle, args=(0.3,))
+    started = time.monotonic()
+    timer.start()
+    limiter.acquire()
+    assert time.monotonic() - started >= 0.3
+    assert limiter.current_rpm == 300
+
+
+def test_rate_limit_errors_are_recognised_with_their_retry_hint():
+    exc = FakeResourceExhausted("429 Resource has been exhausted. Please retry in 17.5s.")
+    assert is_rate_limit_error(exc)
+    assert suggested_retry_delay(exc) == 17.5
+    assert not is_rate_limit_error(FakeServerError("500 An internal error has occurred."))
+
+
+def test_429s_are_retried_and_slow_the_rate():
+    model = _model(burst_every=3, burst_length=1, burst_retry_after=0.01)
+    engine = GenerationEngine(model, max_workers=4, rpm=60_000)
+    results = engine.generate_all([f"prompt {i}" for i in range(9)])
+    assert all(r.error is None for r in results)
+    assert [r.index for r in results] == list(range(9))
+    assert sum(r.attempts - 1 for r in results) == model.throttled > 0
+    assert engine.limiter.current_rpm < 60_000
+
+
+def test_retries_stop_after_max_retries():
+    model = _model(burst_every=1, burst_length=1, burst_retry_after=0.01)
+    engine = GenerationEngine(model, rpm=60_000, max_retries=2)
+    [result] = engine.generate_all(["prompt"])
+    assert isinstance(result.error, FakeResourceExhausted)
+    assert result.attempts == 3
+
+
+def test_server_errors_are_not_retried():
+    engine = GenerationEngine(_model(failure_rate=1.0), rpm=60_000)
+    [result] = engine.generate_all(["prompt"])
+    assert isinstance(result.error, FakeServerError)
+    assert result.attempts == 1
+
+
+def test_streamed_text_and_usage_are_collected():
+    engine = GenerationEngine(_model(), rpm=60_000, stream=True)
+    [result] = engine.generate_all(["x" * 400])
+    assert result.text == "Fake summary (400 prompt characters)."
+    assert result.prompt_tokens == 100
+    assert engine.partials == {}
+
+
+def test_simultaneous_429s_halve_the_rate_once():
+    limiter = RateLimiter(rpm=1200)
+    barrier = threading.Barrier(8)
+
+    def throttled_worker():
+        barrier.wait()
+        limiter.on_throttle(0.2)
+
+    threads = [threading.Thread(target=throttled_worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert limiter.current_rpm == 600
+    limiter.paused_until = 0.0
+    limiter.on_throttle(0.2)  # still no success since the cut: the window is still full
+    assert limiter.current_rpm == 600
+    limiter.on_success()
+    limiter.paused_until = 0.0
+    limiter.on_throttle(0.2)
+    assert limiter.current_rpm == 330  # recovered by 60 to 660, then halved
+
+
+class WindowFullModel(FakeGenerativeModel):
+    """Rejects the first `workers` calls together, as when the server's per-minute window fills."""
+
+    def __init__(self, workers):
+        super().__init__(latency=0, seed=0)
+        self.barrier = threading.Barrier(workers)
+
+    def _check_quota(self):
+        with self._lock:
+            self.requests += 1
+            rejected = self.requests <= self.barrier.parties
+        if rejected:
+            self.barrier.wait()
+            with self._lock:
+                self.throttled += 1
+            raise FakeResourceExhausted("429 Resource has been exhausted. Please retry in 0.05s.")
+
+
+def test_workers_hitting_the_server_window_together_halve_the_rate_once():
+    model = WindowFullModel(workers=8)
+    engine = GenerationEngine(model, max_workers=8, rpm=60_000)
+    results = engine.generate_all([f"prompt {i}" for i in range(8)])
+    assert all(r.error is None for r in results)
+    assert model.throttled == 8
+    # One halving to 30,000, then each success adds back 3,000.
+    assert engine.limiter.current_rpm == 54_000
+
+
+def test_rate_cut_keeps_the_wait_of_existing_reservations():
+    bucket = TokenBucket(1200)
+    for _ in range(10):
+        bucket.reserve(1)  # 0.5 s of debt at 20 requests per second
+    bucket.set_rate(12)
+    assert 0.4 < bucket.reserve(0.0001) < 0.6
@@ -0,0 +1,37 @@
+from jobstore import JobStore
+
+
+def test_latest_record_wins_and_errors_are_not_done(tmp_path):
+    store = JobStore("job", job_dir=str(tmp_path))
+    store.record(0, "first")
+    store.record(0, "second")
+    store.record(1, "done")
+    store.record(1, "failed", error=True)
+    assert store.completed() == {0: "second"}
+
+
+def test_torn_final_line_is_skipped_and_repaired(tmp_path):
+    store = JobStore("job", job_dir=str(tmp_path))
+    store.record(0, "kept")
+    with open(store.path, "a", encoding="utf-8") as f:
+        f.write('{"row": 1, "summary": "torn')
+
+    reopened = JobStore("job", job_dir=str(tmp_path))
+    assert reopened.completed() == {0: "kept"}
+    reopened.record(2, "after crash")
+    assert reopened.completed() == {0: "kept", 2: "after crash"}
+
+
+def test_completed_filters_by_prompt_version(tmp_path):
+    store = JobStore("job", job_dir=str(tmp_path))
+    store.record(0, "full", prompt_version="full-v1")
+    store.record(1, "slim", prompt_version="slim-v1")
+    assert store.completed("full-v1") == {0: "full"}
+    assert store.completed() == {0: "full", 1: "slim"}
+
+
+def test_reset_removes_progress(tmp_path):
+    store = JobStore("job", job_dir=str(tmp_path))
+    store.record(0, "done")
+    store.reset()
+    assert store.completed() == {}
@@ -0,0 +1,33 @@
+from benchmark import synthetic_cohort
+from fake_model import FakeGenerativeModel
+from jobstore import JobStore
+from pipeline import PipelineSettings, SummaryJob
+
+
+def _cohort(rows=3):
+    return synthetic_cohort(rows, seed=1)
+
+
+def _sources(job):
+    return sorted(r.source for r in job.run())
+
+
+def test_saved_rows_resume_only_for_the_same_prompt_version(tmp_path):
+    store = JobStore("job", job_dir=str(tmp_path))
+    model = FakeGenerativeModel(latency=0)
+    full = PipelineSettings(requests_per_minute=6000)
+    slim = PipelineSettings(requests_per_minute=6000, prompt_mode="Slim")
+
+    assert _sources(SummaryJob(_cohort(), full, model, job_store=store)) == ["generated"] * 3
+    assert _sources(SummaryJob(_cohort(), full, model, job_store=store)) == ["saved"] * 3
+    assert _sources(SummaryJob(_cohort(), slim, model, job_store=store)) == ["generated"] * 3
+
+
+def test_saved_rows_are_ignored_when_the_cache_is_bypassed(tmp_path):
+    store = JobStore("job", job_dir=str(tmp_path))
+    model = FakeGenerativeModel(latency=0)
+    settings = PipelineSettings(requests_per_minute=6000)
+    list(SummaryJob(_cohort(), settings, model, job_store=store).run())
+
+    settings.use_cache = False
+    assert _sources(SummaryJob(_cohort(), settings, model, job_store=store)) == ["generated"] * 3
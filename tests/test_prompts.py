@@ -0,0 +1,37 @@
+import math
+
+import pandas as pd
+
+from prompts import band_scores, build_prompts, flag_scores
+
+EDGE_SCORES = [2.49, 2.5, 3.49, 3.5, 2.0, 4.0, math.nan]
+
+
+def _edge_frame():
+    return pd.DataFrame({"Name": ["A"], "Gender": ["F"],
+                         **{f"S{i}": [score] for i, score in enumerate(EDGE_SCORES)}})
+
+
+def test_band_scores_at_the_thresholds():
+    bands = band_scores(_edge_frame()).iloc[0].tolist()
+    assert bands == ["Low", "Moderate", "Moderate", "High", "Low", "High", ""]
+
+
+def test_flag_scores_at_the_thresholds():
+    flags = flag_scores(_edge_frame()).iloc[0].tolist()
+    assert flags == ["", "", "", "", "Development", "Strength", ""]
+
+
+def test_identity_columns_are_not_scored():
+    assert list(band_scores(_edge_frame()).columns) == [f"S{i}" for i in range(len(EDGE_SCORES))]
+
+
+def test_slim_prompt_without_flagged_scores_still_allows_strengths_and_development_areas():
+    df = pd.DataFrame({"Name": ["A"], "Gender": ["M"], "Drive Potential": [3.0], "Purpose": [3.5],
+                       "Mastery": [2.5]})
+    assert (flag_scores(df) == "").all(axis=None)
+    [prompt] = build_prompts(df, "Slim")
+    assert "# Only strengths (>= 4.0): None" in prompt
+    assert "# Only development areas (<= 2.0): None" in prompt
+    assert "Use only the listed" not in prompt
+    assert "# Scores from highest to lowest: Purpose 3.5 (High), Drive Potential 3 (Moderate), Mastery 2.5 (Moderate)" in prompt
@@ -0,0 +1,43 @@
+import pandas as pd
+import pyarrow.parquet as pq
+
+import pipeline
+from benchmark import synthetic_cohort
+from streaming_io import ResultWriter, iter_chunks, read_table
+
+
+def test_whole_number_scores_read_as_float(tmp_path):
+    path = tmp_path / "in.csv"
+    path.write_text("Name,Drive Potential\nA,4\nB,2\nC,3.5\n")
+    chunks = list(iter_chunks(str(path), "csv", chunk_size=2))
+    assert [str(chunk["Drive Potential"].dtype) for chunk in chunks] == ["float64", "float64"]
+    assert list(chunks[1].index) == [2]
+
+
+def test_parquet_output_accepts_fractional_scores_after_whole_ones(tmp_path):
+    source = tmp_path / "in.xlsx"
+    pd.DataFrame({"Name": ["A", "B", "C"], "Drive Potential": [4, 2, 3.5]}).to_excel(source, index=False)
+    output = tmp_path / "out.parquet"
+    with ResultWriter(str(output)) as writer:
+        for chunk in iter_chunks(str(source), "xlsx", chunk_size=2):
+            writer.write(chunk)
+    assert pq.read_table(output).column("Drive Potential").to_pylist() == [4.0, 2.0, 3.5]
+
+
+def test_read_table_matches_the_streamed_chunks(tmp_path):
+    source = tmp_path / "in.xlsx"
+    pd.DataFrame({"Name": ["A", "B", "C"], "Drive Potential": [4, 2, 3.5]}).to_excel(source, index=False)
+    df = read_table(str(source), "xlsx")
+    assert list(df.index) == [0, 1, 2]
+    assert df["Drive Potential"].tolist() == [4.0, 2.0, 3.5]
+
+
+def test_parquet_output_accepts_text_after_a_blank_first_chunk(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # the summary cache and job store are created in the working directory
+    cohort = synthetic_cohort(6)
+    cohort.loc[:2, "Gender"] = None
+    cohort.to_csv("in.csv", index=False)
+    assert pipeline.main(["in.csv", "o.parquet", "--fake", "--rpm", "60000", "--chunk-size", "3"]) == 0
+    table = pq.read_table("o.parquet")
+    assert table.column("Gender").to_pylist()[2:] == [None] + cohort["Gender"].tolist()[3:]
+    assert str(table.schema.field("Gender").type) == "string"
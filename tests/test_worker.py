@@ -0,0 +1,21 @@
+import os
+import stat
+
+from benchmark import synthetic_cohort
+from pipeline import PipelineSettings
+from worker import job_status, run_job, submit_job
+
+
+def test_job_runs_with_its_own_key_and_a_share_of_the_quota(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    data = synthetic_cohort(4).to_csv(index=False).encode("utf-8")
+    settings = PipelineSettings(requests_per_minute=60_000, tokens_per_minute=None)
+    job_id = submit_job(data, settings, input_format="csv", output_format="csv", worker_dir="spool",
+                        api_key="secret")
+    key_path = os.path.join("spool", "jobs", job_id, "api_key")
+    assert stat.S_IMODE(os.stat(key_path).st_mode) == 0o600
+
+    run_job(job_id, "spool", fake=True, slots=2)
+    status = job_status(job_id, "spool")
+    assert (status["state"], status["done"], status["rpm"], status["slots"]) == ("done", 4, 30_000, 2)
+    assert not os.path.exists(key_path)
@@ -0,0 +1,258 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from jobstore import upload_hash
+from metrics import RunMetrics
+from pipeline import PipelineProgress, PipelineSettings, RowResult, run_pipeline
+
+
+# --- Spool Layout ---
+# Each job is a directory under <worker_dir>/jobs/<job_id> holding the uploaded file
+# (input.<format>), its settings and upload hash (spec.json), the submitter's Gemini key
+# (api_key, mode 0600, removed when the job ends), live progress (status.json), the result
+# (output.<format>), its performance summary (metrics.json) and, once a worker has taken
+# it, a claim file with the worker's pid.
+DEFAULT_WORKER_DIR = os.environ.get("HCTA_WORKER_DIR", ".hcta_worker")
+WORKER_SCRIPT = os.path.abspath(__file__)
+
+
+def _jobs_dir(worker_dir: str) -> str:
+    return os.path.join(worker_dir, "jobs")
+
+
+def _job_dir(job_id: str, worker_dir: str) -> str:
+    return os.path.join(_jobs_dir(worker_dir), job_id)
+
+
+def _write_json(path: str, payload: dict) -> None:
+    # Write-then-rename so pollers never read a half-written file.
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str) -> Optional[dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _read_text(path: str) -> Optional[str]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# --- Client API (used by the Streamlit app) ---
+def submit_job(
+    data: bytes,
+    settings: PipelineSettings,
+    label: str = "",
+    input_format: str = "xlsx",
+    output_format: str = "xlsx",
+    worker_dir: str = DEFAULT_WORKER_DIR,
+    api_key: Optional[str] = None,
+) -> str:
+    """Spools one cohort for the worker; `api_key` is used for this job only."""
+    job_id = uuid.uuid4().hex[:12]
+    job_dir = _job_dir(job_id, worker_dir)
+    os.makedirs(job_dir)
+    with open(os.path.join(job_dir, f"input.{input_format}"), "wb") as f:
+        f.write(data)
+    if api_key:
+        # The key goes with the job, not the worker, so a worker started by someone else (or
+        # without a key) never runs this job on the wrong account.
+        fd = os.open(os.path.join(job_dir, "api_key"), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(api_key)
+    _write_json(os.path.join(job_dir, "spec.json"), {
+        "settings": settings.to_dict(),
+        "upload_hash": upload_hash(data),
+        "label": label,
+        "input_format": input_format,
+        "output_format": output_format,
+        "submitted": time.time(),
+    })
+    # status.json is written last: its presence is what makes the job visible to workers.
+    _write_json(os.path.join(job_dir, "status.json"), {"state": "queued", "done": 0, "total": None})
+    return job_id
+
+
+def job_status(job_id: str, worker_dir: str = DEFAULT_WORKER_DIR) -> dict:
+    status = _read_json(os.path.join(_job_dir(job_id, worker_dir), "status.json"))
+    return status or {"state": "unknown", "done": 0, "total": None}
+
+
+def _spec(job_id: str, worker_dir: str) -> dict:
+    return _read_json(os.path.join(_job_dir(job_id, worker_dir), "spec.json")) or {}
+
+
+def job_output_path(job_id: str, worker_dir: str = DEFAULT_WORKER_DIR) -> str:
+    output_format = _spec(job_id, worker_dir).get("output_format", "xlsx")
+    return os.path.join(_job_dir(job_id, worker_dir), f"output.{output_format}")
+
+
+def ensure_worker(worker_dir: str = DEFAULT_WORKER_DIR, slots: int = 2) -> int:
+    """Starts a detached worker process unless one is already serving `worker_dir`.
+
+    API keys are passed per job (see submit_job), so any running worker can serve any job.
+    """
+    os.makedirs(worker_dir, exist_ok=True)
+    pid_file = os.path.join(worker_dir, "worker.pid")
+    pid = (_read_json(pid_file) or {}).get("pid")
+    if pid and _pid_alive(pid):
+        return pid
+    # The child keeps its own copy of the log handle; the parent's is closed straight away.
+    with open(os.path.join(worker_dir, "worker.log"), "ab") as log:
+        process = subprocess.Popen(
+            [sys.executable, WORKER_SCRIPT, "--worker-dir", worker_dir, "--slots", str(slots)],
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+    _write_json(pid_file, {"pid": process.pid})
+    return process.pid
+
+
+def job_metrics(job_id: str, worker_dir: str = DEFAULT_WORKER_DIR) -> Optional[dict]:
+    return _read_json(os.path.join(_job_dir(job_id, worker_dir), "metrics.json"))
+
+
+# --- Worker Side ---
+def _claim(job_dir: str) -> bool:
+    claim_path = os.path.join(job_dir, "claim")
+    claim = _read_json(claim_path)
+    if claim is not None:
+        if _pid_alive(claim.get("pid", 0)):
+            return False
+        # The worker that held this job died; take it over. Completed rows resume from the job store.
+        os.remove(claim_path)
+    try:
+        fd = os.open(claim_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, "w") as f:
+        json.dump({"pid": os.getpid()}, f)
+    return True
+
+
+def _pending_jobs(worker_dir: str) -> List[str]:
+    jobs_dir = _jobs_dir(worker_dir)
+    if not os.path.isdir(jobs_dir):
+        return []
+    pending = []
+    for job_id in sorted(os.listdir(jobs_dir), key=lambda j: os.path.getmtime(os.path.join(jobs_dir, j))):
+        status = _read_json(os.path.join(jobs_dir, job_id, "status.json"))
+        if not status or status.get("state") not in ("queued", "running"):
+            continue
+        claim = _read_json(os.path.join(jobs_dir, job_id, "claim"))
+        if claim is None or not _pid_alive(claim.get("pid", 0)):
+            pending.append(job_id)
+    return pending
+
+
+def run_job(job_id: str, worker_dir: str = DEFAULT_WORKER_DIR, fake: bool = False, slots: int = 1) -> None:
+    job_dir = _job_dir(job_id, worker_dir)
+    if not _claim(job_dir):
+        return
+    status_path = os.path.join(job_dir, "status.json")
+    spec = _spec(job_id, worker_dir)
+    settings = PipelineSettings(**spec.get("settings", {}))
+    # Every slot may use the same API key, so each job gets an equal share of the RPM/TPM
+    # quota, even while it runs alone. The share is reported in status.json.
+    settings.requests_per_minute /= slots
+    if settings.tokens_per_minute:
+        settings.tokens_per_minute /= slots
+    rates = {"rpm": settings.requests_per_minute, "tpm": settings.tokens_per_minute, "slots": slots}
+    key_path = os.path.join(job_dir, "api_key")
+    input_path = os.path.join(job_dir, f"input.{spec.get('input_format', 'xlsx')}")
+    started = time.time()
+    last_write = {"time": 0.0, "done": 0}
+
+    def report(row_result: RowResult, progress: PipelineProgress) -> None:
+        last_write["done"] = progress.done
+        now = time.time()
+        if now - last_write["time"] >= 0.5:
+            last_write["time"] = now
+            _write_json(status_path, {"state": "running", "done": progress.done, "total": progress.total,
+                                      "errors": progress.errors, "started": started, **rates})
+
+    _write_json(status_path, {"state": "running", "done": 0, "total": None, "started": started, **rates})
+    try:
+        model = None
+        if fake:
+            from fake_model import FakeGenerativeModel
+            model = FakeGenerativeModel(model_name=settings.model_name)
+        metrics = RunMetrics(settings.to_dict())
+        api_key = _read_text(key_path) or os.environ.get("GEMINI_API_KEY")
+        progress = run_pipeline(input_path, job_output_path(job_id, worker_dir), settings, model=model,
+                                api_key=api_key, on_result=report, metrics=metrics)
+        _write_json(os.path.join(job_dir, "metrics.json"), metrics.summary())
+        _write_json(status_path, {"state": "done", "done": progress.done, "total": progress.done,
+                                  "errors": progress.errors, "started": started, "finished": time.time(), **rates})
+    except Exception as e:
+        traceback.print_exc()
+        _write_json(status_path, {"state": "failed", "done": last_write["done"], "total": None,
+                                  "error": str(e), "started": started, "finished": time.time(), **rates})
+    finally:
+        # A job that ended no longer needs the key; one interrupted by a crash keeps it to resume.
+        if os.path.exists(key_path):
+            os.remove(key_path)
+        os.remove(os.path.join(job_dir, "claim"))
+
+
+def serve(worker_dir: str = DEFAULT_WORKER_DIR, slots: int = 2, poll_interval: float = 1.0, fake: bool = False) -> None:
+    """Polls the spool directory and runs up to `slots` jobs in parallel processes.
+
+    Each job is limited to 1/`slots` of its RPM/TPM settings. A job whose upload is already
+    being generated stays queued until that run finishes, then resumes from its job store.
+    """
+    os.makedirs(_jobs_dir(worker_dir), exist_ok=True)
+    _write_json(os.path.join(worker_dir, "worker.pid"), {"pid": os.getpid()})
+    running = {}  # job_id -> (future, upload hash)
+    with ProcessPoolExecutor(max_workers=slots) as pool:
+        while True:
+            running = {job_id: job for job_id, job in running.items() if not job[0].done()}
+            for job_id in _pending_jobs(worker_dir):
+                if len(running) >= slots:
+                    break
+                if job_id in running:
+                    continue
+                upload = _spec(job_id, worker_dir).get("upload_hash")
+                if upload is not None and any(upload == u for _, u in running.values()):
+                    continue
+                running[job_id] = (pool.submit(run_job, job_id, worker_dir, fake, slots), upload)
+            time.sleep(poll_interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Background worker for HCTA summary jobs.")
+    parser.add_argument("--worker-dir", default=DEFAULT_WORKER_DIR)
+    parser.add_argument("--slots", type=int, default=2, help="Cohorts generated in parallel.")
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--fake", action="store_true", help="Use the offline fake model instead of Gemini.")
+    args = parser.parse_args()
+    serve(args.worker_dir, args.slots, args.poll_interval, args.fake)